@@ -1,47 +1,113 @@
-from typing import Dict, List
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Callable, Dict, List
 import pandas as pd
 import numpy as np
 from utils.assistant import Assistant
 from .position_sizing import PositionSizer
+from utils.cached_frame import CachedFrame
 from utils.rule_implementations import RULE_IMPLEMENTATIONS
+from utils._njit import njit, NUMBA_AVAILABLE
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=128)
+def _compile_function(code: str, func_name: str, filename: str) -> Callable:
+    """Compile generated strategy code once and return the function it defines."""
+    namespace = {
+        'pd': pd,
+        'np': np,
+        'RULE_IMPLEMENTATIONS': RULE_IMPLEMENTATIONS,
+        'PositionSizer': PositionSizer
+    }
+    exec(compile(code, filename, 'exec'), namespace)
+    return namespace[func_name]
+
+@njit(cache=True)
+def _equity_kernel(returns: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Compound equity bar by bar, keeping the previous value on NaN inputs."""
+    n = len(returns)
+    equity = np.empty(n)
+    if n == 0:
+        return equity
+    equity[0] = 1.0
+    for i in range(1, n):
+        growth = 1.0 + positions[i] * returns[i]
+        if math.isnan(growth):
+            equity[i] = equity[i - 1]
+        else:
+            equity[i] = equity[i - 1] * growth
+    return equity
+
+# Strategy spec shared by every task in a backtest worker process
+_worker_spec = None
+
+def _init_worker(strategy_spec: Dict) -> None:
+    """Store the spec and compile its generated code once per worker process."""
+    global _worker_spec
+    _worker_spec = strategy_spec
+    if strategy_spec.get('signal_fn') is None:
+        _compile_function(strategy_spec['signal_code'], 'calculate_signals', '<signal>')
+    _compile_function(strategy_spec['sizing_code'], 'calculate_position_sizes', '<sizing>')
+
+def _run_one(item):
+    symbol, df = item
+    return symbol, BacktestAgent().run_backtest({symbol: df}, _worker_spec)
 
 class BacktestAgent(Assistant):
-    def __init__(self):
+    def __init__(self, precision: str = 'float32'):
+        """
+        Args:
+            precision: dtype of the returned equity curve and positions.
+                Computation runs in float64; only the results are downcast.
+        """
         super().__init__(
             name="Backtest Agent",
             description="Strategy backtesting engine",
             instructions="Execute trading strategies and generate results"
         )
+        self.precision = precision
     
     def run_backtest(self, data: Dict[str, pd.DataFrame], strategy_spec: Dict) -> Dict:
         try:
             symbol = list(data.keys())[0]
             df = data[symbol]
             
-            # Execute strategy
-            signals = self._execute_strategy(df, strategy_spec['signal_code'])
-            print(f"Generated signals shape: {signals.shape}")
+            # Execute strategy, preferring the precompiled signal function
+            signal_fn = strategy_spec.get('signal_fn')
+            if signal_fn is not None:
+                signals = signal_fn(df)
+            else:
+                signals = self._execute_strategy(df, strategy_spec['signal_code'])
+            logger.debug("Generated signals shape: %s", signals.shape)
             
             positions = self._apply_position_sizing(df, signals, strategy_spec['sizing_code'])
-            print(f"Generated positions shape: {positions.shape}")
+            logger.debug("Generated positions shape: %s", positions.shape)
             
             trades = self._generate_trades(df, positions)
-            print(f"Generated trades shape: {trades.shape}")
+            logger.debug("Generated trades shape: %s", trades.shape)
             
             equity_curve = self._calculate_equity_curve(df, positions)
-            print(f"Generated equity curve shape: {equity_curve.shape}")
+            logger.debug("Generated equity curve shape: %s", equity_curve.shape)
             
             # Ensure equity_curve is a Series with datetime index
             if isinstance(equity_curve, pd.DataFrame):
                 equity_curve = equity_curve.iloc[:, 0]
             equity_curve.index = pd.to_datetime(equity_curve.index)
             
+            # Reported metrics only need reduced precision
+            equity_curve = equity_curve.astype(self.precision)
+            positions = positions.astype(self.precision)
+            
             # Ensure trades DataFrame has required columns
             if len(trades) > 0:
                 required_columns = ['pnl', 'hold_time']
                 for col in required_columns:
                     if col not in trades.columns:
-                        print(f"Warning: Missing column {col} in trades DataFrame")
+                        logger.warning("Missing column %s in trades DataFrame", col)
             
             return {
                 'status': 'success',
@@ -50,104 +116,117 @@ class BacktestAgent(Assistant):
                 'positions': positions
             }
         except Exception as e:
-            print(f"Backtest error: {str(e)}")
+            logger.error("Backtest error: %s", e)
             return {'status': 'error', 'message': str(e)}
     
-    def _execute_strategy(self, data: pd.DataFrame, signal_code: str) -> pd.DataFrame:
-        print("\nExecuting Strategy:")
-        print(f"Data shape: {data.shape}")
-        print(f"Data columns: {data.columns.tolist()}")
-        print(f"Signal code:\n{signal_code}")
-        
-        namespace = {
-            'pd': pd,
-            'np': np,
-            'data': data,
-            'RULE_IMPLEMENTATIONS': RULE_IMPLEMENTATIONS
+    def run_backtests(self, data: Dict[str, pd.DataFrame], strategy_spec: Dict, max_workers: int = None) -> Dict:
+        """Backtest every symbol in a separate process and combine the results.
+        
+        The portfolio equity curve allocates equal capital to each symbol.
+        """
+        if not data:
+            return {'status': 'error', 'message': 'No data to backtest'}
+        
+        max_workers = min(max_workers or os.cpu_count() or 1, len(data))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(strategy_spec,)) as executor:
+            results = dict(executor.map(_run_one, data.items()))
+        
+        curves = {
+            symbol: result['equity_curve']
+            for symbol, result in results.items()
+            if result['status'] == 'success'
         }
+        if not curves:
+            return {'status': 'error', 'message': 'All backtests failed', 'results': results}
         
-        # Execute the strategy code in the namespace
-        exec(signal_code, globals(), namespace)
-        signals = namespace['calculate_signals'](data)
+        equity_curve = pd.concat(curves, axis=1).ffill().mean(axis=1)
+        return {
+            'status': 'success',
+            'results': results,
+            'equity_curve': equity_curve
+        }
+    
+    def _execute_strategy(self, data: pd.DataFrame, signal_code: str) -> pd.DataFrame:
+        logger.debug("Executing strategy on data shape %s", data.shape)
+        logger.debug("Data columns: %s", data.columns.tolist())
+        logger.debug("Signal code:\n%s", signal_code)
+        
+        calculate_signals = _compile_function(signal_code, 'calculate_signals', '<signal>')
+        signals = calculate_signals(data)
         
-        print(f"Generated signals shape: {signals.shape}")
-        print(f"Signals head:\n{signals.head()}")
+        logger.debug("Generated signals shape: %s", signals.shape)
         return signals
     
     def _apply_position_sizing(self, data: pd.DataFrame, signals: pd.DataFrame, sizing_code: str) -> pd.DataFrame:
-        # Create a namespace with required modules and data
-        namespace = {
-            'pd': pd,
-            'np': np,
-            'data': data,
-            'signals': signals,
-            'PositionSizer': PositionSizer  # Add this
-        }
-        
-        # Execute the sizing code in the namespace
-        exec(sizing_code, globals(), namespace)
-        
-        # Call the calculate_position_sizes function from the namespace
-        return namespace['calculate_position_sizes'](data, signals)
+        calculate_position_sizes = _compile_function(sizing_code, 'calculate_position_sizes', '<sizing>')
+        return calculate_position_sizes(CachedFrame(data), signals)
     
     def _generate_trades(self, data: pd.DataFrame, positions: pd.Series) -> pd.DataFrame:
-        trades = []
-        current_position = 0
-        entry_price = None
-        entry_date = None
-        
-        for date, position in positions.items():
-            if position != current_position:
-                # Calculate PnL if closing or modifying position
-                if current_position != 0:
-                    price = data.loc[date, 'Close']
-                    pnl = (price - entry_price) * current_position
-                    hold_time = (date - entry_date).days
-                else:
-                    pnl = 0.0
-                    hold_time = 0
-                
-                trade = {
-                    'date': date,
-                    'price': data.loc[date, 'Close'],
-                    'size': position - current_position,
-                    'direction': 'BUY' if position > current_position else 'SELL',
-                    'position': position,
-                    'pnl': pnl,
-                    'hold_time': hold_time
-                }
-                trades.append(trade)
-                
-                # Update entry price and date for new position
-                if position != 0:
-                    entry_price = data.loc[date, 'Close']
-                    entry_date = date
-                current_position = position
-        
-        trades_df = pd.DataFrame(trades)
-        if len(trades_df) > 0:
-            trades_df.set_index('date', inplace=True)
+        # Walk positions in date order, one entry per date
+        if not positions.index.is_monotonic_increasing:
+            positions = positions.sort_index()
+        if positions.index.has_duplicates:
+            positions = positions[~positions.index.duplicated(keep='last')]
+        
+        pos = positions.to_numpy(dtype=float)
+        prev_pos = np.concatenate(([0.0], pos[:-1]))
+        
+        # A trade happens wherever the position differs from the previous bar
+        change_idx = np.flatnonzero(pos != prev_pos)
+        if len(change_idx) == 0:
+            return pd.DataFrame()
+        
+        dates = positions.index[change_idx]
+        
+        # Look up closes positionally, only at the change points
+        close_idx = data.index.get_indexer(dates)
+        if (close_idx < 0).any():
+            raise KeyError(f"No price data for trade dates {list(dates[close_idx < 0])}")
+        prices = data['Close'].to_numpy()[close_idx]
+        new_pos = pos[change_idx]
+        old_pos = prev_pos[change_idx]
+        
+        # The open position was entered at the previous change point
+        entry_prices = np.concatenate(([np.nan], prices[:-1]))
+        days_held = np.zeros(len(change_idx), dtype=np.int64)
+        days_held[1:] = (dates[1:] - dates[:-1]).days
+        
+        # PnL and hold time only apply when closing or modifying a position
+        closing = old_pos != 0
+        trades_df = pd.DataFrame({
+            'price': prices,
+            'size': new_pos - old_pos,
+            'direction': np.where(new_pos > old_pos, 'BUY', 'SELL'),
+            'position': new_pos,
+            'pnl': np.where(closing, (prices - entry_prices) * old_pos, 0.0),
+            'hold_time': np.where(closing, days_held, 0)
+        }, index=dates)
+        trades_df.index.name = 'date'
         return trades_df
     
     def _calculate_equity_curve(self, data: pd.DataFrame, positions: pd.Series) -> pd.Series:
-        print("\nCalculating Equity Curve:")
-        print(f"Initial data shape: {data.shape}")
-        print(f"Positions shape: {positions.shape}")
+        logger.debug("Calculating equity curve: data shape %s, positions shape %s", data.shape, positions.shape)
         
         equity = pd.Series(1.0, index=data.index)
         
         if len(positions) == 0:
-            print("Warning: No positions to calculate equity curve")
+            logger.warning("No positions to calculate equity curve")
             return equity
         
         returns = data['Close'].pct_change(fill_method=None).fillna(0)  # Fill NaN with 0 for first day
-        for date in data.index[1:]:
-            prev_date = data.index[data.index.get_loc(date)-1]
-            if pd.isna(positions.loc[date]) or pd.isna(returns.loc[date]):
-                equity.loc[date] = equity.loc[prev_date]  # Keep previous value if NaN
-            else:
-                equity.loc[date] = equity.loc[prev_date] * (1 + positions.loc[date] * returns.loc[date])
+        returns = returns.to_numpy(dtype=np.float64)
+        positions = positions.reindex(data.index).to_numpy(dtype=np.float64)
+        
+        if NUMBA_AVAILABLE:
+            equity_vals = _equity_kernel(returns, positions)
+        else:
+            # Compound daily growth factors; a NaN factor keeps the previous value
+            growth = 1.0 + positions * returns
+            growth = np.where(np.isnan(growth), 1.0, growth)
+            growth[0] = 1.0
+            equity_vals = np.cumprod(growth)
+        equity = pd.Series(equity_vals, index=data.index)
         
-        print(f"Final equity curve shape: {equity.shape}")
-        print(f"Equity curve head:\n{equity.head()}")
+        logger.debug("Final equity curve shape: %s", equity.shape)
         return equity 
\ No newline at end of file
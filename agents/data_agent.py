@@ -3,34 +3,87 @@ import pandas as pd
 import yfinance as yf
 import numpy as np
 from utils.assistant import Assistant
+from utils.fetch_cache import download_history
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
 
 class DataAgent(Assistant):
-    def __init__(self):
+    def __init__(self, precision: str = 'float64'):
+        """
+        Args:
+            precision: dtype for the OHLC price columns, e.g. 'float32' to
+                halve memory traffic on long histories
+        """
         super().__init__(
             name="Data Agent",
             description="Financial data retrieval and preprocessing agent",
             instructions="Fetch and preprocess financial data"
         )
+        self.precision = precision
     
-    def fetch_data(self, symbol: str, period: str = "1y") -> pd.DataFrame:
+    def fetch_data(self, symbol: str, period: str = "1y", start: str = None, end: str = None) -> pd.DataFrame:
         """Fetch historical data for a given symbol using Yahoo Finance periods
         
         Args:
             symbol: Stock symbol
             period: Valid periods: 1d,5d,1mo,3mo,6mo,1y,2y,5y,10y,ytd,max
+            start: Start date (YYYY-MM-DD); with start or end, period is ignored
+            end: End date (YYYY-MM-DD), exclusive
         """
         try:
-            ticker = yf.Ticker(symbol)
-            df = ticker.history(period=period)
+            df = download_history(symbol, period, start, end)
             if len(df) == 0:
                 return f"No data found for symbol {symbol}"
             return self.preprocess_data(df)
         except Exception as e:
             return f"Error fetching data: {str(e)}"
     
+    def fetch_many(self, symbols: List[str], period: str = "1y") -> Dict[str, pd.DataFrame]:
+        """Fetch historical data for several symbols in one batched download
+        
+        Args:
+            symbols: Stock symbols
+            period: Valid periods: 1d,5d,1mo,3mo,6mo,1y,2y,5y,10y,ytd,max
+        
+        Returns:
+            Mapping of symbol to preprocessed data, or to an error message
+            for symbols that could not be fetched (as with fetch_data)
+        """
+        symbols = list(dict.fromkeys(symbols))
+        try:
+            raw = yf.download(symbols, period=period, group_by='ticker', auto_adjust=True,
+                              threads=True, progress=False)
+        except Exception as e:
+            return {symbol: f"Error fetching data: {str(e)}" for symbol in symbols}
+        
+        results = {}
+        for symbol in symbols:
+            if isinstance(raw.columns, pd.MultiIndex):
+                if symbol not in raw.columns.get_level_values(0):
+                    results[symbol] = f"No data found for symbol {symbol}"
+                    continue
+                df = raw[symbol]
+            else:
+                df = raw
+            df = df.dropna(how='all')
+            if len(df) == 0:
+                results[symbol] = f"No data found for symbol {symbol}"
+            else:
+                results[symbol] = self.preprocess_data(df.copy())
+        return results
+    
     def preprocess_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """Clean and preprocess the data"""
         df = df.ffill()
-        df['Returns'] = df['Close'].pct_change(fill_method=None)
-        df['Log_Returns'] = np.log(df['Close'] / df['Close'].shift(1))
+        if self.precision != 'float64':
+            df = df.astype({col: self.precision for col in PRICE_COLUMNS if col in df.columns})
+        
+        # Differences of the close array; the first bar has no return
+        close = df['Close'].to_numpy(dtype=np.float64)
+        returns = np.full(len(close), np.nan)
+        log_returns = np.full(len(close), np.nan)
+        returns[1:] = np.diff(close) / close[:-1]
+        log_returns[1:] = np.diff(np.log(close))
+        df['Returns'] = returns
+        df['Log_Returns'] = log_returns
         return df 
\ No newline at end of file
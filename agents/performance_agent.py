@@ -1,9 +1,52 @@
+import logging
+import math
 from typing import Dict, List
 import pandas as pd
 import numpy as np
 from utils.assistant import Assistant
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from utils._njit import njit, NUMBA_AVAILABLE
+
+logger = logging.getLogger(__name__)
+
+@njit(cache=True, error_model='numpy')
+def _return_stats_kernel(equity: np.ndarray):
+    """Welford mean/variance and downside moments of bar returns in one pass."""
+    n = 0
+    mean = 0.0
+    m2 = 0.0
+    downside_sq = 0.0
+    n_downside = 0
+    for i in range(1, len(equity)):
+        r = equity[i] / equity[i - 1] - 1.0
+        if math.isnan(r):
+            continue
+        n += 1
+        delta = r - mean
+        mean += delta / n
+        m2 += delta * (r - mean)
+        if r < 0.0:
+            downside_sq += r * r
+            n_downside += 1
+    if n == 0:
+        mean = math.nan
+    std = math.sqrt(m2 / (n - 1)) if n > 1 else math.nan
+    return n, mean, std, downside_sq, n_downside
+
+def _return_stats(equity: np.ndarray):
+    """Return (count, mean, std, downside sum of squares, downside count) of bar returns."""
+    if NUMBA_AVAILABLE:
+        return _return_stats_kernel(equity)
+    
+    r = equity[1:] / equity[:-1] - 1.0
+    r = r[~np.isnan(r)]
+    n = r.size
+    mean = r.mean() if n > 0 else math.nan
+    # Two-pass variance, which agrees with the kernel's Welford updates
+    std = math.sqrt(np.var(r, ddof=1)) if n > 1 else math.nan
+    downside = np.minimum(r, 0.0)
+    return n, mean, std, np.dot(downside, downside), np.count_nonzero(downside)
 
 class PerformanceAgent(Assistant):
     def __init__(self):
@@ -15,19 +58,18 @@ class PerformanceAgent(Assistant):
     
     def analyze_performance(self, equity_curve: pd.Series, trades: pd.DataFrame) -> Dict:
         """Generate comprehensive performance analysis"""
-        print(f"Analyzing performance:")
-        print(f"Equity curve shape: {equity_curve.shape}")
-        print(f"Trades shape: {trades.shape}")
-        print(f"Trades columns: {trades.columns.tolist() if not trades.empty else 'No trades'}")
+        logger.debug("Analyzing performance: equity curve shape %s, trades shape %s",
+                     equity_curve.shape, trades.shape)
+        
+        drawdown = self.calculate_drawdown(equity_curve)
         
-        metrics = self.calculate_metrics(equity_curve)
-        print(f"Calculated metrics: {metrics}")
+        metrics = self.calculate_metrics(equity_curve, drawdown)
+        logger.debug("Calculated metrics: %s", metrics)
         
         trade_stats = self.analyze_trades(trades)
-        print(f"Calculated trade stats: {trade_stats}")
+        logger.debug("Calculated trade stats: %s", trade_stats)
         
-        charts = self.generate_charts(equity_curve)
-        print("Generated charts")
+        charts = self.generate_charts(equity_curve, drawdown)
         
         return {
             "metrics": metrics,
@@ -35,34 +77,43 @@ class PerformanceAgent(Assistant):
             "charts": charts
         }
     
-    def calculate_metrics(self, equity_curve: pd.Series) -> Dict:
+    def calculate_drawdown(self, equity_curve: pd.Series) -> np.ndarray:
+        """Fractional drawdown from the running peak of the equity curve"""
+        equity = equity_curve.to_numpy(dtype=np.float64)
+        return equity / np.maximum.accumulate(equity) - 1
+    
+    def calculate_metrics(self, equity_curve: pd.Series, drawdown: np.ndarray = None) -> Dict:
         """Calculate performance metrics with proper error handling"""
         try:
-            returns = equity_curve.pct_change(fill_method=None).dropna()
+            if drawdown is None:
+                drawdown = self.calculate_drawdown(equity_curve)
+            
+            equity = equity_curve.to_numpy(dtype=np.float64)
+            n_returns, mean_return, std_return, downside_sq, n_downside = _return_stats(equity)
             
             # Basic return calculations
-            total_return = (equity_curve.iloc[-1] / equity_curve.iloc[0] - 1) * 100
-            annual_return = returns.mean() * 252 * 100
-            volatility = returns.std() * np.sqrt(252) * 100
+            total_return = (equity[-1] / equity[0] - 1) * 100
+            annual_return = mean_return * 252 * 100
+            volatility = std_return * np.sqrt(252) * 100
             
             # Risk-adjusted metrics
             sharpe_ratio = annual_return / volatility if volatility != 0 else 0
-            max_drawdown = ((equity_curve / equity_curve.expanding().max() - 1).min()) * 100
+            max_drawdown = drawdown.min() * 100
             calmar_ratio = abs(annual_return / max_drawdown) if max_drawdown != 0 else 0
-            sortino = self.calculate_sortino(returns)
+            sortino = self._sortino_ratio(n_returns, mean_return, downside_sq, n_downside)
             
             metrics = {
-                "Total Return (%)": round(total_return, 2),
-                "Annual Return (%)": round(annual_return, 2),
-                "Volatility (%)": round(volatility, 2),
-                "Sharpe Ratio": round(sharpe_ratio, 2),
-                "Max Drawdown (%)": round(max_drawdown, 2),
-                "Calmar Ratio": round(calmar_ratio, 2),
-                "Sortino Ratio": round(sortino, 2)
+                "Total Return (%)": round(float(total_return), 2),
+                "Annual Return (%)": round(float(annual_return), 2),
+                "Volatility (%)": round(float(volatility), 2),
+                "Sharpe Ratio": round(float(sharpe_ratio), 2),
+                "Max Drawdown (%)": round(float(max_drawdown), 2),
+                "Calmar Ratio": round(float(calmar_ratio), 2),
+                "Sortino Ratio": round(float(sortino), 2)
             }
             return metrics
         except Exception as e:
-            print(f"Error calculating metrics: {str(e)}")
+            logger.error("Error calculating metrics: %s", e)
             return {
                 "Total Return (%)": 0,
                 "Annual Return (%)": 0,
@@ -86,26 +137,28 @@ class PerformanceAgent(Assistant):
             }
         
         try:
-            winning_trades = trades[trades['pnl'] > 0]
-            losing_trades = trades[trades['pnl'] < 0]
+            n_trades = len(trades)
+            pnl = trades['pnl'].to_numpy(dtype=np.float64)
+            wins = pnl > 0
+            losses = pnl < 0
+            n_wins = int(np.count_nonzero(wins))
+            n_losses = int(np.count_nonzero(losses))
+            win_sum = np.where(wins, pnl, 0.0).sum()
+            loss_sum = np.where(losses, pnl, 0.0).sum()
             
-            # Add debug prints
-            print(f"\nTrade Analysis Debug:")
-            print(f"Total trades: {len(trades)}")
-            print(f"Winning trades: {len(winning_trades)}")
-            print(f"Losing trades: {len(losing_trades)}")
+            logger.debug("Trades: %d total, %d winning, %d losing", n_trades, n_wins, n_losses)
             
             stats = {
-                "total_trades": len(trades),
-                "win_rate": len(winning_trades) / len(trades) * 100 if len(trades) > 0 else 0,
-                "avg_win": winning_trades['pnl'].mean() if len(winning_trades) > 0 else 0,
-                "avg_loss": losing_trades['pnl'].mean() if len(losing_trades) > 0 else 0,
-                "profit_factor": abs(winning_trades['pnl'].sum() / losing_trades['pnl'].sum()) if len(losing_trades) > 0 and losing_trades['pnl'].sum() != 0 else float('inf'),
+                "total_trades": n_trades,
+                "win_rate": n_wins / n_trades * 100,
+                "avg_win": win_sum / n_wins if n_wins > 0 else 0,
+                "avg_loss": loss_sum / n_losses if n_losses > 0 else 0,
+                "profit_factor": abs(win_sum / loss_sum) if n_losses > 0 and loss_sum != 0 else float('inf'),
                 "avg_hold_time": trades['hold_time'].mean()
             }
             return stats
         except Exception as e:
-            print(f"Error analyzing trades: {str(e)}")
+            logger.error("Error analyzing trades: %s", e)
             return {
                 "total_trades": len(trades),
                 "win_rate": 0,
@@ -115,8 +168,11 @@ class PerformanceAgent(Assistant):
                 "avg_hold_time": 0
             }
     
-    def generate_charts(self, equity_curve: pd.Series) -> go.Figure:
+    def generate_charts(self, equity_curve: pd.Series, drawdown: np.ndarray = None) -> go.Figure:
         """Generate enhanced performance visualizations"""
+        if drawdown is None:
+            drawdown = self.calculate_drawdown(equity_curve)
+        
         fig = make_subplots(
             rows=3, cols=1,
             subplot_titles=('Equity Curve', 'Drawdown', 'Monthly Returns'),
@@ -136,10 +192,9 @@ class PerformanceAgent(Assistant):
         )
         
         # Drawdown
-        drawdown = equity_curve / equity_curve.expanding().max() - 1
         fig.add_trace(
             go.Scatter(
-                x=drawdown.index,
+                x=equity_curve.index,
                 y=drawdown * 100,
                 name='Drawdown',
                 fill='tonexty',
@@ -155,7 +210,7 @@ class PerformanceAgent(Assistant):
                 x=monthly_returns.index,
                 y=monthly_returns,
                 name='Monthly Returns',
-                marker_color=monthly_returns.apply(lambda x: '#00b3b3' if x >= 0 else '#ff3333')
+                marker_color=np.where(monthly_returns.to_numpy() >= 0, '#00b3b3', '#ff3333')
             ),
             row=3, col=1
         )
@@ -179,19 +234,24 @@ class PerformanceAgent(Assistant):
 
     def calculate_sortino(self, returns: pd.Series) -> float:
         """Calculate Sortino ratio (using 0% as minimum acceptable return)"""
-        if len(returns) == 0:
+        r = returns.to_numpy(dtype=np.float64)
+        downside = np.minimum(r, 0.0)
+        mean = r.mean() if len(r) > 0 else math.nan
+        return self._sortino_ratio(len(r), mean, np.dot(downside, downside), np.count_nonzero(downside))
+    
+    @staticmethod
+    def _sortino_ratio(n_returns: int, mean_return: float, downside_sq: float, n_downside: int) -> float:
+        """Sortino ratio from the mean return and the moments of returns below 0"""
+        if n_returns == 0:
             return 0.0
         
-        # Calculate downside returns (returns below 0)
-        downside_returns = returns[returns < 0]
-        
-        if len(downside_returns) == 0:
+        if n_downside == 0:
             return float('inf')  # No downside volatility
         
         # Calculate downside deviation (annualized)
-        downside_std = np.sqrt(252) * np.sqrt(np.mean(downside_returns**2))
+        downside_std = np.sqrt(252) * np.sqrt(downside_sq / n_downside)
         
         # Calculate annualized return
-        annualized_return = returns.mean() * 252
+        annualized_return = mean_return * 252
         
-        return annualized_return / downside_std 
\ No newline at end of file
+        return annualized_return / downside_std
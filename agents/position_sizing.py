@@ -1,6 +1,9 @@
 from typing import Dict, List
 import pandas as pd
 import numpy as np
+from utils._njit import NUMBA_AVAILABLE
+from utils import _sizing_njit
+from utils.cached_frame import PriceData, as_cached_frame
 
 class PositionSizer:
     def __init__(self):
@@ -12,53 +15,54 @@ class PositionSizer:
             "kelly_criterion": self.kelly_sizing
         }
     
-    def fixed_percent_sizing(self, data: pd.DataFrame, params: Dict) -> pd.Series:
+    def fixed_percent_sizing(self, data: PriceData, params: Dict) -> pd.Series:
         """Fixed percentage of portfolio per position"""
         position_size = params.get('position_size', 0.01)  # Default 1%
         return pd.Series(position_size, index=data.index)
     
-    def volatility_targeting_sizing(self, data: pd.DataFrame, params: Dict) -> pd.Series:
+    def volatility_targeting_sizing(self, data: PriceData, params: Dict) -> pd.Series:
         """Target a specific volatility level for position sizing"""
         target_vol = params.get('target_vol', 0.20)  # Target 20% annual vol
         lookback = params.get('lookback', 60)
+        max_size = params.get('max_size', 0.30)
+        frame = as_cached_frame(data)
+        
+        if NUMBA_AVAILABLE:
+            returns = frame.returns.to_numpy(dtype=np.float64)
+            position_sizes = _sizing_njit.vol_target_sizing(returns, int(lookback), float(target_vol), float(max_size))
+            return pd.Series(position_sizes, index=frame.index)
         
         # Calculate asset volatility
-        returns = data['Close'].pct_change(fill_method=None)
-        vol = returns.rolling(lookback).std() * np.sqrt(252)
+        vol = frame.rolling_std(lookback) * np.sqrt(252)
         
         # Size position inversely to volatility
         position_sizes = target_vol / vol
         
         # Apply maximum position size constraint
-        max_size = params.get('max_size', 0.30)
         return position_sizes.clip(upper=max_size)
     
-    def equal_risk_sizing(self, data: pd.DataFrame, params: Dict) -> pd.Series:
+    def equal_risk_sizing(self, data: PriceData, params: Dict) -> pd.Series:
         """Size positions to contribute equal risk"""
         risk_per_trade = params.get('risk_per_trade', 0.01)  # 1% risk per trade
         atr_periods = params.get('atr_periods', 14)
         
         # Calculate ATR
-        tr = pd.DataFrame()
-        tr['h-l'] = data['High'] - data['Low']
-        tr['h-pc'] = abs(data['High'] - data['Close'].shift(1))
-        tr['l-pc'] = abs(data['Low'] - data['Close'].shift(1))
-        atr = tr.max(axis=1).rolling(atr_periods).mean()
+        atr = as_cached_frame(data).atr(atr_periods)
         
         # Position size = Risk Amount / (ATR * Price)
         position_sizes = risk_per_trade / (atr / data['Close'])
         
         return position_sizes
     
-    def inverse_volatility_weights(self, assets_data: Dict[str, pd.DataFrame], params: Dict) -> Dict[str, pd.Series]:
+    def inverse_volatility_weights(self, assets_data: Dict[str, PriceData], params: Dict) -> Dict[str, pd.Series]:
         """Calculate position weights based on inverse volatility"""
         lookback = params.get('lookback', 60)
         
         # Calculate volatilities for each asset
-        vols = {}
-        for symbol, data in assets_data.items():
-            returns = data['Close'].pct_change(fill_method=None)
-            vols[symbol] = returns.rolling(lookback).std() * np.sqrt(252)
+        vols = {
+            symbol: as_cached_frame(data).rolling_std(lookback) * np.sqrt(252)
+            for symbol, data in assets_data.items()
+        }
         
         # Calculate inverse volatility weights
         inv_vols = pd.DataFrame(vols)
@@ -67,7 +71,7 @@ class PositionSizer:
         
         return {symbol: weights[symbol] for symbol in assets_data.keys()}
     
-    def kelly_sizing(self, data: pd.DataFrame, params: Dict) -> pd.Series:
+    def kelly_sizing(self, data: PriceData, params: Dict) -> pd.Series:
         """Kelly Criterion position sizing"""
         win_rate = params.get('win_rate', 0.5)
         profit_ratio = params.get('profit_ratio', 2.0)  # Avg Win / Avg Loss
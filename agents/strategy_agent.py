@@ -2,12 +2,14 @@
 Strategy generation and management.
 """
 
+import json
+from functools import lru_cache
 from typing import Dict, List
 import pandas as pd
 import numpy as np
 from utils.assistant import Assistant
 from .position_sizing import PositionSizer
-from utils.rule_implementations import RULE_IMPLEMENTATIONS
+from utils.rule_implementations import CombinedSignal
 
 class StrategyAgent(Assistant):
     def __init__(self):
@@ -31,6 +33,7 @@ class StrategyAgent(Assistant):
         
         # Generate the strategy calculation code
         return {
+            'signal_fn': CombinedSignal(categories),
             'signal_code': self._generate_signal_code(categories),
             'sizing_code': self._generate_position_sizing_code(strategy_spec['position_sizing'])
         }
@@ -44,7 +47,7 @@ def calculate_signals(data):
     from utils.rule_implementations import RULE_IMPLEMENTATIONS
     
     # Initialize final signal
-    final_signal = pd.Series(0, index=data.index)
+    final_signal = pd.Series(0.0, index=data.index)
     total_weight = 0
     
     # Calculate signals for each category and rule
@@ -57,7 +60,7 @@ def calculate_signals(data):
             
             code += f"""
     # {category_key.title()} signals
-    category_signal = pd.Series(0, index=data.index)
+    category_signal = pd.Series(0.0, index=data.index)
     category_weight = {category_weight}
     total_weight += category_weight
 """
@@ -95,15 +98,20 @@ def calculate_signals(data):
     
     def _generate_position_sizing_code(self, position_sizing: Dict) -> str:
         """Generate code for position sizing calculations."""
-        method = position_sizing['method']
-        params = position_sizing['params']
+        params_json = json.dumps(position_sizing['params'], sort_keys=True, default=str)
+        return self._position_sizing_code(position_sizing['method'], params_json)
+    
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _position_sizing_code(method: str, params_json: str) -> str:
+        """Build sizing code for a method and JSON-encoded params, memoized across calls."""
+        params = json.loads(params_json)
         
         if method == "volatility_targeting":
             return f"""
 def calculate_position_sizes(data, signals):
     # Calculate volatility
-    returns = data['Close'].pct_change()
-    vol = returns.rolling({params['lookback']}).std() * np.sqrt(252)
+    vol = data.rolling_std({params['lookback']}) * np.sqrt(252)
     
     # Calculate position sizes
     target_vol = {params['target_vol']}
@@ -132,11 +140,7 @@ def calculate_position_sizes(data, signals):
             return f"""
 def calculate_position_sizes(data, signals):
     # Calculate ATR
-    tr = pd.DataFrame()
-    tr['h-l'] = data['High'] - data['Low']
-    tr['h-pc'] = abs(data['High'] - data['Close'].shift(1))
-    tr['l-pc'] = abs(data['Low'] - data['Close'].shift(1))
-    atr = tr.max(axis=1).rolling({params['atr_periods']}).mean()
+    atr = data.atr({params['atr_periods']})
     
     # Calculate position sizes based on risk per trade
     risk_amount = {params['risk_per_trade']}
@@ -148,8 +152,7 @@ def calculate_position_sizes(data, signals):
             return f"""
 def calculate_position_sizes(data, signals):
     # Calculate volatility
-    returns = data['Close'].pct_change()
-    vol = returns.rolling({params['lookback']}).std() * np.sqrt(252)
+    vol = data.rolling_std({params['lookback']}) * np.sqrt(252)
     
     # Calculate inverse volatility position sizes
     position_sizes = signals * (1 / vol)
@@ -1,3 +1,7 @@
+import asyncio
+import json
+import logging
+import time
 import streamlit as st
 from utils.assistant import Assistant
 from agents.data_agent import DataAgent
@@ -7,9 +11,219 @@ from agents.performance_agent import PerformanceAgent
 from utils.strategy_rules import STRATEGY_CATEGORIES, StrategyRuleManager
 import yfinance as yf
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 
+try:
+    from plotly_resampler import FigureResampler
+except ImportError:  # plotly-resampler is optional; plot traces at full resolution
+    FigureResampler = None
+
+logging.basicConfig(level=logging.WARNING)
+
+# Points per line trace sent to the browser when plotly-resampler is installed
+MAX_PLOT_POINTS = 2000
+
+# Market data is refetched hourly; results derived from it are keyed on the
+# fetch time so they never outlive it, and expire with it
+CACHE_TTL = 3600
+MAX_CACHED_BACKTESTS = 32
+
+def new_figure() -> go.Figure:
+    """Create a figure that downsamples long line traces when possible."""
+    if FigureResampler is None:
+        return go.Figure()
+    return FigureResampler(go.Figure(), default_n_shown_samples=MAX_PLOT_POINTS)
+
+def add_line_trace(fig: go.Figure, trace, x, y, text=None, marker_color=None):
+    """Add a line trace, handing full-resolution data to the resampler if any."""
+    if FigureResampler is not None and isinstance(fig, FigureResampler):
+        fig.add_trace(trace, hf_x=x, hf_y=y, hf_text=text, hf_marker_color=marker_color)
+    else:
+        trace.update(x=x, y=y, text=text)
+        if marker_color is not None:
+            trace.update(marker_color=marker_color)
+        fig.add_trace(trace)
+
+@st.cache_resource
+def get_data_agent() -> DataAgent:
+    return DataAgent()
+
+@st.cache_resource
+def get_strategy_agent() -> StrategyAgent:
+    return StrategyAgent()
+
+@st.cache_resource
+def get_backtest_agent() -> BacktestAgent:
+    return BacktestAgent()
+
+@st.cache_resource
+def get_performance_agent() -> PerformanceAgent:
+    return PerformanceAgent()
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch_data_cached(symbol: str, period: str) -> pd.DataFrame:
+    """Fetch market data once per (symbol, period) and hour.
+    
+    The fetch time is stored in ``data.attrs['fetched_at']``. Raises
+    ValueError on fetch errors so that failures are not cached.
+    """
+    data = get_data_agent().fetch_data(symbol, period)
+    if isinstance(data, str):
+        raise ValueError(data)
+    data.attrs['fetched_at'] = time.time()
+    return data
+
+def fetch_data_concurrently(symbols: tuple, period: str) -> dict:
+    """Fetch several symbols in parallel threads through the per-symbol cache.
+    
+    Returns:
+        Mapping of symbol to data, or to the exception raised while fetching it
+    """
+    async def fetch_all():
+        return await asyncio.gather(
+            *(asyncio.to_thread(fetch_data_cached, symbol, period) for symbol in symbols),
+            return_exceptions=True
+        )
+    return dict(zip(symbols, asyncio.run(fetch_all())))
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=MAX_CACHED_BACKTESTS, show_spinner=False)
+def run_backtest_cached(symbol: str, period: str, spec_json: str, fetched_at: float, _data: pd.DataFrame):
+    """Backtest and analyze a strategy once per (symbol, period, strategy spec)
+    and fetch of the data.
+    
+    Returns:
+        Tuple of (signal code, backtest results, performance or None)
+    """
+    strategy_spec = json.loads(spec_json)
+    strategy_code = get_strategy_agent().generate_complete_strategy(strategy_spec)
+    backtest_results = get_backtest_agent().run_backtest(
+        {symbol: _data},
+        {**strategy_spec, **strategy_code}
+    )
+    
+    performance = None
+    if backtest_results['status'] == 'success':
+        performance = get_performance_agent().analyze_performance(
+            backtest_results['equity_curve'],
+            backtest_results['trades']
+        )
+    return strategy_code['signal_code'], backtest_results, performance
+
+# Price segment styling indexed by position sign (0 flat, 1 long, -1 short)
+SEGMENT_NAMES = np.array(['No Position', 'Long', 'Short'])
+SEGMENT_COLORS = np.array(['#00b3b3', 'rgba(0,255,0,1)', 'rgba(255,0,0,1)'])
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=MAX_CACHED_BACKTESTS, show_spinner=False)
+def index_trades_by_year(backtest_key: tuple, _trades: pd.DataFrame):
+    """Convert the trade index to datetimes once per backtest run.
+    
+    Returns:
+        Tuple of (trades with a DatetimeIndex, year of each trade, sorted trade years)
+    """
+    trade_index = pd.to_datetime(_trades.index)
+    trade_year = trade_index.year.to_numpy()
+    return _trades.set_index(trade_index), trade_year, np.unique(trade_year).tolist()
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=MAX_CACHED_BACKTESTS, show_spinner=False)
+def yearly_trade_stats(backtest_key: tuple, _trades: pd.DataFrame, _trade_year: np.ndarray) -> pd.DataFrame:
+    """Per-year trade statistics as display strings, one row per year.
+    
+    Aggregated in one groupby and formatted once per backtest run.
+    """
+    pnl = _trades['pnl']
+    stats = pd.DataFrame({
+        'year': _trade_year,
+        'pnl': pnl.to_numpy(),
+        'win_pnl': pnl.where(pnl > 0).to_numpy(),
+        'loss_pnl': pnl.where(pnl < 0).to_numpy(),
+        'hold_time': _trades['hold_time'].to_numpy()
+    }).groupby('year').agg(
+        total=('pnl', 'size'),
+        wins=('win_pnl', 'count'),
+        losses=('loss_pnl', 'count'),
+        avg_win=('win_pnl', 'mean'),
+        avg_loss=('loss_pnl', 'mean'),
+        avg_hold=('hold_time', 'mean')
+    )
+    return pd.DataFrame({
+        "Total Trades": stats['total'].astype(str),
+        "Winning Trades": stats['wins'].astype(str),
+        "Losing Trades": stats['losses'].astype(str),
+        "Win Rate": (stats['wins'] / stats['total'] * 100).map("{:.1f}%".format),
+        "Average Win": stats['avg_win'].map("${:.2f}".format),
+        "Average Loss": stats['avg_loss'].map("${:.2f}".format),
+        "Average Hold Time": stats['avg_hold'].map("{:.1f} days".format)
+    })
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=MAX_CACHED_BACKTESTS, show_spinner=False)
+def build_year_view(backtest_key: tuple, year: int, _data: pd.DataFrame,
+                    _positions: pd.Series, _trades: pd.DataFrame,
+                    _trade_year: np.ndarray) -> dict:
+    """Slice one year of a backtest run for the trade and position charts.
+    
+    Cached per (backtest_key, year). The underscore-prefixed arguments are not
+    hashed by Streamlit; backtest_key identifies the run they belong to.
+    """
+    year_data = _data[_data.index.year == year]
+    year_positions = _positions[_positions.index.year == year]
+    year_trades = _trades.iloc[_trade_year == year]
+    
+    # Align positions with price data
+    aligned_data = pd.DataFrame({
+        'price': year_data['Close'].astype(np.float32),
+        'position': year_positions
+    })
+    aligned_data['position'] = aligned_data['position'].fillna(0)
+    
+    # Buy/sell markers
+    size = year_trades['size'].to_numpy()
+    traded = size != 0
+    size = size[traded]
+    is_buy = size > 0
+    entries = {
+        'x': year_trades.index[traded],
+        'price': year_trades['price'].to_numpy(dtype=np.float32)[traded],
+        'size': np.abs(size).astype(np.float32),
+        'color': np.where(is_buy, 'green', 'red'),
+        'symbol': np.where(is_buy, 'triangle-up', 'triangle-down'),
+        'text': np.char.add(
+            np.where(is_buy, 'Buy', 'Sell'),
+            np.char.mod(' (%.2f)', year_trades['pnl'].to_numpy()[traded])
+        )
+    }
+    
+    # Price segments colored by position sign, broken by a NaN point at each sign change
+    segment = np.sign(aligned_data['position'].to_numpy()).astype(np.int8)
+    breaks = np.flatnonzero(np.diff(segment)) + 1
+    take = np.insert(np.arange(len(segment)), breaks, breaks)
+    segment_price = aligned_data['price'].to_numpy()[take]
+    segment_price[breaks + np.arange(len(breaks))] = np.nan
+    segment_sign = segment[take]
+    
+    # Position chart areas on the trading-day index
+    year_position_values = year_positions.to_numpy(dtype=np.float32)
+    
+    return {
+        'aligned_data': aligned_data,
+        'segment_x': aligned_data.index[take],
+        'segment_y': segment_price,
+        'segment_color': SEGMENT_COLORS[segment_sign],
+        'segment_text': np.char.add(
+            SEGMENT_NAMES[segment_sign],
+            np.char.mod(' (%.1f%%)', aligned_data['position'].to_numpy()[take] * 100)
+        ),
+        'year_positions': year_positions,
+        'long_positions': np.where(year_position_values >= 0, year_position_values, np.float32(0)),
+        'short_positions': np.where(year_position_values < 0, year_position_values, np.float32(0)),
+        'entries': entries
+    }
+
 def initialize_session_state():
+    if 'backtest_request' not in st.session_state:
+        st.session_state.backtest_request = None
+    if 'backtest_key' not in st.session_state:
+        st.session_state.backtest_key = None
     if 'backtest_results' not in st.session_state:
         st.session_state.backtest_results = None
     if 'equity_curve' not in st.session_state:
@@ -31,8 +245,17 @@ def initialize_session_state():
     if 'temp_rule_params' not in st.session_state:
         st.session_state.temp_rule_params = {}
 
+# Rule types offered per category; STRATEGY_CATEGORIES is static at runtime
+RULE_CHOICES = {
+    (category, subcat): list(subcat_info['rules'].keys())
+    for category, cat_info in STRATEGY_CATEGORIES.items()
+    for subcat, subcat_info in cat_info['subcategories'].items()
+}
+
+@st.fragment
 def render_strategy_rules():
-    st.sidebar.header("Strategy Rules")
+    """Rule editor; reruns on its own widgets without rerunning the whole app."""
+    st.header("Strategy Rules")
     
     # Add CSS for better styling
     st.markdown("""
@@ -46,7 +269,7 @@ def render_strategy_rules():
     
     # Iterate through main categories (Entry/Exit)
     for category, cat_info in STRATEGY_CATEGORIES.items():
-        with st.sidebar.expander(f"{'🎯' if category == 'entry' else '🚪'} {cat_info['name']}", expanded=True):
+        with st.expander(f"{'🎯' if category == 'entry' else '🚪'} {cat_info['name']}", expanded=True):
             st.markdown(f"_{cat_info['description']}_")
             
             # Iterate through subcategories
@@ -68,7 +291,7 @@ def render_strategy_rules():
                     for i, rule in enumerate(st.session_state.strategy_manager.active_rules[f"{category}_{subcat}"]):
                         rule_info = subcat_info['rules'][rule.rule_type]
                         st.markdown(f"🔹 {rule_info['name']}")
-                        params = [f"{param_name}: {value}" for param_name, value in rule.parameters.items() if param_name != 'weight']
+                        params = [f"{param_name}: {value}" for param_name, value in rule.parameters if param_name != 'weight']
                         st.markdown(f"_{', '.join(params)}_")
                         if st.button("🗑️ Remove", key=f"remove_{category}_{subcat}_{i}", help=f"Remove this {rule_info['name']} rule"):
                             st.session_state.strategy_manager.remove_rule(f"{category}_{subcat}", i)
@@ -86,7 +309,7 @@ def render_strategy_rules():
                     # Rule type selection
                     rule_type = st.selectbox(
                         "Rule Type",
-                        options=list(subcat_info['rules'].keys()),
+                        options=RULE_CHOICES[(category, subcat)],
                         format_func=lambda x: subcat_info['rules'][x]['name'],
                         key=f"rule_type_{category}_{subcat}"
                     )
@@ -131,23 +354,230 @@ def render_strategy_rules():
                 
                 st.markdown("---")
 
+@st.cache_resource(show_spinner=False, ttl=CACHE_TTL, max_entries=8)
+def build_equity_figure(backtest_key: tuple, show_buy_hold: bool,
+                        _equity_curve: pd.Series, _buy_hold_equity: pd.Series) -> go.Figure:
+    """Strategy vs buy-and-hold figure, built once per backtest run.
+    
+    The figure is shared across sessions and must not be modified by callers.
+    """
+    fig = new_figure()
+    add_line_trace(
+        fig,
+        go.Scattergl(name='Strategy'),
+        _equity_curve.index,
+        _equity_curve.values
+    )
+    if show_buy_hold:
+        add_line_trace(
+            fig,
+            go.Scattergl(name='Buy & Hold', line=dict(dash='dash')),
+            _buy_hold_equity.index,
+            _buy_hold_equity.values
+        )
+    fig.update_layout(
+        xaxis_title="Date",
+        yaxis_title="Equity",
+        template='plotly_dark'
+    )
+    return fig
+
+@st.fragment
+def render_equity_chart():
+    """Equity curve chart, rendered independently of the rest of the results."""
+    st.subheader("Strategy Performance")
+    fig = build_equity_figure(
+        st.session_state.backtest_key,
+        st.session_state.show_buy_hold,
+        st.session_state.equity_curve,
+        st.session_state.buy_hold_equity
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+@st.fragment
+def render_year_analysis():
+    """Yearly trade charts and statistics; changing the year reruns only this fragment."""
+    st.subheader("Trade Analysis")
+    
+    # Group trades by year
+    trades_df, trade_year, years = index_trades_by_year(
+        st.session_state.backtest_key,
+        st.session_state.trades_df
+    )
+    
+    # Initialize selected year if needed
+    if st.session_state.selected_year is None or st.session_state.selected_year not in years:
+        st.session_state.selected_year = years[-1]
+    
+    selected_year = st.selectbox(
+        "Select Year",
+        years,
+        index=years.index(st.session_state.selected_year),
+        key='year_selector'
+    )
+    st.session_state.selected_year = selected_year
+    
+    # Create trade visualization
+    fig = new_figure()
+    
+    # Add price line with position coloring
+    if st.session_state.data is not None and 'positions' in st.session_state.backtest_results:
+        year_view = build_year_view(
+            st.session_state.backtest_key,
+            selected_year,
+            st.session_state.data,
+            pd.Series(st.session_state.backtest_results['positions']),
+            trades_df,
+            trade_year
+        )
+        aligned_data = year_view['aligned_data']
+        entries = year_view['entries']
+        
+        # Add base price line for continuity
+        add_line_trace(
+            fig,
+            go.Scattergl(
+                name='Price',
+                line=dict(color='rgba(0,179,179,0.3)', width=1),
+                showlegend=False,
+                hoverinfo='skip'
+            ),
+            aligned_data.index,
+            aligned_data['price'].values
+        )
+        
+        # Price segments colored by position in a single trace
+        add_line_trace(
+            fig,
+            go.Scattergl(
+                name='Position',
+                mode='lines+markers',
+                line=dict(color='#00b3b3', width=2),
+                marker=dict(size=3),
+                connectgaps=False,
+                hovertemplate=
+                "<b>%{text}</b><br>" +
+                "Date: %{x}<br>" +
+                "Price: $%{y:.2f}<br>" +
+                "<extra></extra>"
+            ),
+            year_view['segment_x'],
+            year_view['segment_y'],
+            text=year_view['segment_text'],
+            marker_color=year_view['segment_color']
+        )
+        
+        # Add buy/sell markers with PnL information
+        fig.add_trace(go.Scattergl(
+            x=entries['x'],
+            y=entries['price'],
+            mode='markers',
+            name='Trades',
+            marker=dict(
+                color=entries['color'],
+                size=10,
+                symbol=entries['symbol']
+            ),
+            hovertemplate=
+            "<b>%{text}</b><br>" +
+            "Date: %{x}<br>" +
+            "Price: $%{y:.2f}<br>" +
+            "Size: %{customdata:.1%}<br>" +
+            "<extra></extra>",
+            text=entries['text'],
+            customdata=entries['size']
+        ))
+        
+        fig.update_layout(
+            title=f"Trades for {selected_year}",
+            xaxis_title="Date",
+            yaxis_title="Price",
+            height=400,
+            template='plotly_dark',
+            showlegend=True,
+            hovermode='x unified'
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # Add position size visualization
+        fig_pos = new_figure()
+        
+        position_index = year_view['year_positions'].index
+        
+        # Add long positions (green)
+        if len(position_index) > 0:
+            add_line_trace(
+                fig_pos,
+                go.Scattergl(
+                    name='Long',
+                    fill='tozeroy',
+                    line=dict(color='rgba(0,255,0,0.5)', width=1),
+                    fillcolor='rgba(0,255,0,0.2)'
+                ),
+                position_index,
+                year_view['long_positions']
+            )
+        
+        # Add short positions (red)
+        if (year_view['short_positions'] < 0).any():
+            add_line_trace(
+                fig_pos,
+                go.Scattergl(
+                    name='Short',
+                    fill='tozeroy',
+                    line=dict(color='rgba(255,0,0,0.5)', width=1),
+                    fillcolor='rgba(255,0,0,0.2)'
+                ),
+                position_index,
+                year_view['short_positions']
+            )
+        
+        # Add zero line
+        fig_pos.add_hline(
+            y=0, 
+            line_dash="dash", 
+            line_color="white",
+            line_width=1,
+            opacity=0.5
+        )
+        
+        fig_pos.update_layout(
+            title=f"Position Sizes for {selected_year}",
+            xaxis_title="Date",
+            yaxis_title="Position Size",
+            height=300,
+            template='plotly_dark',
+            showlegend=True,
+            yaxis=dict(
+                tickformat='.0%',  # Format y-axis as percentages
+                zeroline=True,
+                zerolinecolor='white',
+                zerolinewidth=1
+            )
+        )
+        st.plotly_chart(fig_pos, use_container_width=True)
+        
+        # Show trade statistics for the year
+        year_stats = yearly_trade_stats(
+            st.session_state.backtest_key,
+            trades_df,
+            trade_year
+        ).loc[[selected_year]].T
+        year_stats.columns = ['Value']
+        
+        st.dataframe(year_stats)
+
 def main():
     st.title("Trading Strategy Assistant")
     
     # Initialize session state
     initialize_session_state()
     
-    # Initialize agents
-    data_agent = DataAgent()
-    strategy_agent = StrategyAgent()
-    backtest_agent = BacktestAgent()
-    performance_agent = PerformanceAgent()
-    
     # Sidebar for inputs
     with st.sidebar:
         # Data Settings
         with st.expander("📈 Data Settings", expanded=True):
-            symbol = st.text_input("Symbol", "AAPL")
+            symbols = st.text_input("Symbols", "AAPL", help="One or more symbols, separated by commas")
             period = st.selectbox(
                 "Data Period",
                 ["1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "max"],
@@ -219,58 +649,69 @@ def main():
                     "max_size": max_position
                 }
     
+        st.checkbox("🐞 Debug mode", key='debug_mode', help="Show the strategy configuration and generated code")
+    
     # Main area - Run Backtest button
     if st.button("🚀 Run Backtest", help="Run the backtest with the current strategy configuration"):
+        # Strategy specification
+        strategy_spec = {
+            'type': 'combined',
+            'categories': st.session_state.strategy_manager.get_rules_config(),
+            'position_sizing': {
+                'method': position_method,
+                'params': sizing_params
+            }
+        }
+        symbol_list = tuple(dict.fromkeys(s.strip() for s in symbols.split(',') if s.strip()))
+        st.session_state.backtest_request = (symbol_list, period, json.dumps(strategy_spec, sort_keys=True, default=str))
+    
+    # Results of the last run are served from the cache on later reruns
+    if st.session_state.backtest_request is not None:
         with st.spinner("Running backtest..."):
             try:
-                # Get strategy configuration
-                strategy_config = st.session_state.strategy_manager.get_rules_config()
-                
-                # Strategy specification
-                strategy_spec = {
-                    'type': 'combined',
-                    'categories': strategy_config,
-                    'position_sizing': {
-                        'method': position_method,
-                        'params': sizing_params
-                    }
-                }
+                symbol_list, period, spec_json = st.session_state.backtest_request
+                if not symbol_list:
+                    st.error("Enter at least one symbol")
+                    return
                 
-                # Run backtest
-                data = data_agent.fetch_data(symbol, period)
-                if isinstance(data, str):
-                    st.error(f"Error fetching data: {data}")
+                # Fetch all symbols concurrently
+                datasets = fetch_data_concurrently(symbol_list, period)
+                for failed_symbol, result in datasets.items():
+                    if isinstance(result, Exception):
+                        st.error(f"Error fetching data for {failed_symbol}: {result}")
+                fetched = [s for s in symbol_list if not isinstance(datasets[s], Exception)]
+                if not fetched:
                     return
                 
-                strategy_code = strategy_agent.generate_complete_strategy(strategy_spec)
+                symbol = fetched[0]
+                if len(fetched) > 1:
+                    symbol = st.selectbox("Show results for", fetched, key='results_symbol')
+                data = datasets[symbol]
+                
+                # Run backtest
+                fetched_at = data.attrs['fetched_at']
+                st.session_state.backtest_key = (symbol, period, spec_json, fetched_at)
+                signal_code, backtest_results, performance = run_backtest_cached(
+                    symbol, period, spec_json, fetched_at, data
+                )
                 
                 # Debug information
-                st.write("Strategy Configuration:")
-                st.json(strategy_spec)
-                if strategy_code:
+                if st.session_state.get('debug_mode'):
+                    st.write("Strategy Configuration:")
+                    st.json(json.loads(spec_json))
                     st.write("Generated Strategy Code:")
-                    st.code(strategy_code.get('signal_code', 'No signal code generated'))
-                
-                backtest_results = backtest_agent.run_backtest(
-                    {symbol: data},
-                    {**strategy_spec, **strategy_code}
-                )
+                    st.code(signal_code)
                 
                 if backtest_results['status'] == 'success':
                     st.success("Backtest completed successfully!")
                     
                     # Store results
                     st.session_state.backtest_results = backtest_results
-                    st.session_state.equity_curve = pd.Series(backtest_results['equity_curve'])
+                    # Plot in float32 to halve the chart payload
+                    st.session_state.equity_curve = pd.Series(backtest_results['equity_curve']).astype(np.float32)
                     st.session_state.trades_df = pd.DataFrame(backtest_results['trades'])
                     st.session_state.data = data
-                    st.session_state.buy_hold_equity = data['Close'] / data['Close'].iloc[0]
-                    
-                    # Show results
-                    performance = performance_agent.analyze_performance(
-                        st.session_state.equity_curve,
-                        st.session_state.trades_df
-                    )
+                    st.session_state.buy_hold_equity = (data['Close'] / data['Close'].iloc[0]).astype(np.float32)
                     
                     # Display metrics
                     col1, col2 = st.columns(2)
@@ -280,7 +721,7 @@ def main():
                             performance['metrics'].items(),
                             columns=['Metric', 'Value']
                         ).set_index('Metric')
-                        st.dataframe(metrics_df.style.format("{:.2f}"))
+                        st.dataframe(metrics_df.round(2))
                     
                     with col2:
                         st.subheader("Trade Statistics")
@@ -293,208 +734,14 @@ def main():
                             "Profit Factor": trade_stats['profit_factor'],
                             "Avg Hold Time (days)": trade_stats['avg_hold_time']
                         }, index=['Value']).T
-                        st.dataframe(stats_df.style.format("{:.2f}"))
+                        st.dataframe(stats_df.round(2))
                     
                     # Show equity curve
-                    st.subheader("Strategy Performance")
-                    fig = go.Figure()
-                    fig.add_trace(go.Scatter(
-                        x=st.session_state.equity_curve.index,
-                        y=st.session_state.equity_curve,
-                        name='Strategy'
-                    ))
-                    if st.session_state.show_buy_hold:
-                        fig.add_trace(go.Scatter(
-                            x=st.session_state.buy_hold_equity.index,
-                            y=st.session_state.buy_hold_equity,
-                            name='Buy & Hold',
-                            line=dict(dash='dash')
-                        ))
-                    fig.update_layout(
-                        xaxis_title="Date",
-                        yaxis_title="Equity",
-                        template='plotly_dark'
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
+                    render_equity_chart()
                     
                     # Show trade analysis
                     if len(st.session_state.trades_df) > 0:
-                        st.subheader("Trade Analysis")
-                        
-                        # Group trades by year
-                        trades_df = st.session_state.trades_df.copy()
-                        trades_df.index = pd.to_datetime(trades_df.index)
-                        years = sorted(trades_df.index.year.unique())
-                        
-                        # Initialize selected year if needed
-                        if st.session_state.selected_year is None or st.session_state.selected_year not in years:
-                            st.session_state.selected_year = years[-1]
-                        
-                        selected_year = st.selectbox(
-                            "Select Year",
-                            years,
-                            index=years.index(st.session_state.selected_year),
-                            key='year_selector'
-                        )
-                        st.session_state.selected_year = selected_year
-                        
-                        # Filter trades for selected year
-                        year_trades = trades_df[trades_df.index.year == selected_year]
-                        
-                        # Create trade visualization
-                        fig = go.Figure()
-                        
-                        # Add price line with position coloring
-                        if st.session_state.data is not None and 'positions' in st.session_state.backtest_results:
-                            year_data = st.session_state.data[st.session_state.data.index.year == selected_year]
-                            positions = pd.Series(st.session_state.backtest_results['positions'])
-                            year_positions = positions[positions.index.year == selected_year]
-                            
-                            # Align positions with price data
-                            aligned_data = pd.DataFrame({
-                                'price': year_data['Close'],
-                                'position': year_positions
-                            })
-                            aligned_data['position'] = aligned_data['position'].fillna(0)
-                            
-                            # Add base price line for continuity
-                            fig.add_trace(go.Scatter(
-                                x=aligned_data.index,
-                                y=aligned_data['price'],
-                                name='Price',
-                                line=dict(color='rgba(0,179,179,0.3)', width=1),
-                                showlegend=False,
-                                hoverinfo='skip'
-                            ))
-                            
-                            # Split data into segments based on position
-                            for position_type, color, pos_name in [
-                                (lambda x: x > 0, 'rgba(0,255,0,1)', 'Long'),  # Long - Green
-                                (lambda x: x < 0, 'rgba(255,0,0,1)', 'Short'),  # Short - Red
-                                (lambda x: x == 0, '#00b3b3', 'No Position'),   # No position - Default
-                            ]:
-                                mask = position_type(aligned_data['position'])
-                                if mask.any():
-                                    segment_data = aligned_data[mask].copy()
-                                    segment_data['position_pct'] = segment_data['position'] * 100
-                                    
-                                    fig.add_trace(go.Scatter(
-                                        x=segment_data.index,
-                                        y=segment_data['price'],
-                                        name=pos_name,
-                                        line=dict(color=color, width=2),
-                                        hovertemplate=
-                                        "<b>%{text}</b><br>" +
-                                        "Date: %{x}<br>" +
-                                        "Price: $%{y:.2f}<br>" +
-                                        "<extra></extra>",
-                                        text=[f"{pos_name} ({row['position_pct']:.1f}%)" for _, row in segment_data.iterrows()]
-                                    ))
-                            
-                            # Add buy/sell markers with PnL information
-                            entries = year_trades[year_trades['size'] != 0].copy()
-                            entries['direction'] = entries['size'].apply(lambda x: 'Buy' if x > 0 else 'Sell')
-                            entries['marker_color'] = entries['direction'].apply(lambda x: 'green' if x == 'Buy' else 'red')
-                            
-                            fig.add_trace(go.Scatter(
-                                x=entries.index,
-                                y=entries['price'],
-                                mode='markers',
-                                name='Trades',
-                                marker=dict(
-                                    color=entries['marker_color'],
-                                    size=10,
-                                    symbol=['triangle-up' if x == 'Buy' else 'triangle-down' for x in entries['direction']]
-                                ),
-                                hovertemplate=
-                                "<b>%{text}</b><br>" +
-                                "Date: %{x}<br>" +
-                                "Price: $%{y:.2f}<br>" +
-                                "Size: %{customdata:.1%}<br>" +
-                                "<extra></extra>",
-                                text=[f"{row['direction']} ({row['pnl']:.2f})" for _, row in entries.iterrows()],
-                                customdata=abs(entries['size'])
-                            ))
-                            
-                            fig.update_layout(
-                                title=f"Trades for {selected_year}",
-                                xaxis_title="Date",
-                                yaxis_title="Price",
-                                height=400,
-                                template='plotly_dark',
-                                showlegend=True,
-                                hovermode='x unified'
-                            )
-                            st.plotly_chart(fig, use_container_width=True)
-                            
-                            # Add position size visualization
-                            fig_pos = go.Figure()
-                            
-                            # Create a continuous filled area from min to max of the time range
-                            dates = pd.date_range(start=year_positions.index.min(), end=year_positions.index.max(), freq='D')
-                            full_positions = year_positions.reindex(dates).fillna(0)
-                            
-                            # Add long positions (green)
-                            long_mask = full_positions >= 0
-                            if long_mask.any():
-                                fig_pos.add_trace(go.Scatter(
-                                    x=full_positions.index,
-                                    y=full_positions.where(long_mask, 0),
-                                    name='Long',
-                                    fill='tozeroy',
-                                    line=dict(color='rgba(0,255,0,0.5)', width=1),
-                                    fillcolor='rgba(0,255,0,0.2)'
-                                ))
-                            
-                            # Add short positions (red)
-                            short_mask = full_positions < 0
-                            if short_mask.any():
-                                fig_pos.add_trace(go.Scatter(
-                                    x=full_positions.index,
-                                    y=full_positions.where(short_mask, 0),
-                                    name='Short',
-                                    fill='tozeroy',
-                                    line=dict(color='rgba(255,0,0,0.5)', width=1),
-                                    fillcolor='rgba(255,0,0,0.2)'
-                                ))
-                            
-                            # Add zero line
-                            fig_pos.add_hline(
-                                y=0, 
-                                line_dash="dash", 
-                                line_color="white",
-                                line_width=1,
-                                opacity=0.5
-                            )
-                            
-                            fig_pos.update_layout(
-                                title=f"Position Sizes for {selected_year}",
-                                xaxis_title="Date",
-                                yaxis_title="Position Size",
-                                height=300,
-                                template='plotly_dark',
-                                showlegend=True,
-                                yaxis=dict(
-                                    tickformat='.0%',  # Format y-axis as percentages
-                                    zeroline=True,
-                                    zerolinecolor='white',
-                                    zerolinewidth=1
-                                )
-                            )
-                            st.plotly_chart(fig_pos, use_container_width=True)
-                            
-                            # Show trade statistics for the year
-                            year_stats = pd.DataFrame({
-                                "Total Trades": len(year_trades),
-                                "Winning Trades": len(year_trades[year_trades['pnl'] > 0]),
-                                "Losing Trades": len(year_trades[year_trades['pnl'] < 0]),
-                                "Win Rate": f"{len(year_trades[year_trades['pnl'] > 0]) / len(year_trades) * 100:.1f}%",
-                                "Average Win": f"${year_trades[year_trades['pnl'] > 0]['pnl'].mean():.2f}",
-                                "Average Loss": f"${year_trades[year_trades['pnl'] < 0]['pnl'].mean():.2f}",
-                                "Average Hold Time": f"{year_trades['hold_time'].mean():.1f} days"
-                            }, index=['Value']).T
-                            
-                            st.dataframe(year_stats)
+                        render_year_analysis()
                 else:
                     st.error(f"Backtest failed: {backtest_results['message']}")
             
@@ -0,0 +1,127 @@
+"""
+The rule kernels and the fused combined-signal kernel against the pandas
+fallbacks, with numba and with the same kernels run as plain Python.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from utils import _kernels, cached_frame, rule_implementations
+from utils._njit import NUMBA_AVAILABLE
+from utils.cached_frame import CachedFrame
+from utils.rule_implementations import CombinedSignal, compile_combined_signal
+
+WINDOW = 5
+
+COMBINED_CONFIG = {
+    'entry': {'weight': 1.0, 'rules': [
+        {'type': 'roc', 'parameters': {'lookback': WINDOW, 'threshold': 0.01, 'weight': 1.0}},
+        {'type': 'channel', 'parameters': {'lookback': WINDOW, 'channel_width': 0.5, 'weight': 0.5}},
+        {'type': 'sma_crossover', 'parameters': {'fast_period': 3, 'slow_period': WINDOW, 'weight': 1.0}},
+    ]},
+    'exit': {'weight': 0.5, 'rules': [
+        {'type': 'support_resistance', 'parameters': {'lookback': WINDOW, 'threshold': 0.02, 'weight': 1.0}},
+        {'type': 'atr_breakout', 'parameters': {'lookback': WINDOW, 'multiplier': 1.0, 'weight': 1.0}},
+    ]},
+    'risk': {'weight': 0.25, 'rules': [
+        {'type': 'volatility_regime', 'parameters': {'lookback': WINDOW, 'threshold': 1.1, 'weight': 1.0}},
+    ]},
+}
+
+def make_prices(n: int, kind: str) -> pd.DataFrame:
+    """OHLC bars: a random walk, the same with NaN gaps, or a flat price."""
+    rng = np.random.default_rng(n)
+    if kind == 'flat':
+        close = np.full(n, 100.0)
+        high = close + 1.0
+        low = close - 1.0
+    else:
+        close = 100 * np.exp(np.cumsum(rng.normal(0.0, 0.02, n)))
+        high = close * (1 + np.abs(rng.normal(0, 0.01, n)))
+        low = close * (1 - np.abs(rng.normal(0, 0.01, n)))
+        if kind == 'nan':
+            for values in (close, high, low):
+                values[1::7] = np.nan
+    return pd.DataFrame(
+        {'High': high, 'Low': low, 'Close': close},
+        index=pd.bdate_range('2020-01-01', periods=n)
+    )
+
+@pytest.fixture(params=['numba', 'python'])
+def kernels(request, monkeypatch):
+    """The kernel module, compiled or as plain Python, with the rule and
+    cache code switched to their pandas fallbacks for the reference."""
+    monkeypatch.setattr(rule_implementations, 'NUMBA_AVAILABLE', False)
+    monkeypatch.setattr(cached_frame, 'NUMBA_AVAILABLE', False)
+    if request.param == 'numba':
+        if not NUMBA_AVAILABLE:
+            pytest.skip("numba is not installed")
+    elif NUMBA_AVAILABLE:
+        # What the no-op njit leaves behind when numba is not installed
+        for name in dir(_kernels):
+            py_func = getattr(getattr(_kernels, name), 'py_func', None)
+            if py_func is not None:
+                monkeypatch.setattr(_kernels, name, py_func)
+        monkeypatch.setattr(rule_implementations, 'njit', lambda *args, **kwargs: (lambda func: func))
+    return _kernels
+
+lengths = pytest.mark.parametrize('n', [0, 1, 3, 25])
+kinds = pytest.mark.parametrize('kind', ['random', 'nan', 'flat'])
+
+@lengths
+@kinds
+def test_rolling_mean(kernels, n, kind):
+    close = make_prices(n, kind)['Close']
+    expected = close.rolling(WINDOW).mean().to_numpy()
+    np.testing.assert_allclose(kernels.rolling_mean(close.to_numpy(), WINDOW), expected, rtol=1e-12)
+
+@lengths
+@kinds
+def test_rolling_max_and_min(kernels, n, kind):
+    close = make_prices(n, kind)['Close']
+    values = close.to_numpy()
+    np.testing.assert_array_equal(kernels.rolling_max(values, WINDOW), close.rolling(WINDOW).max().to_numpy())
+    np.testing.assert_array_equal(-kernels.rolling_max(-values, WINDOW), close.rolling(WINDOW).min().to_numpy())
+
+@lengths
+@kinds
+def test_volatility_regime(kernels, n, kind):
+    data = make_prices(n, kind)
+    params = {'lookback': WINDOW, 'threshold': 1.1}
+    expected = rule_implementations.calculate_volatility_regime(data, params).to_numpy()
+    signal = kernels.volatility_regime_signal(data['Close'].to_numpy(), WINDOW, 1.1)
+    np.testing.assert_array_equal(signal, expected)
+
+@lengths
+@kinds
+def test_combined_signal(kernels, n, kind):
+    data = make_prices(n, kind)
+    expected = CombinedSignal(COMBINED_CONFIG)(data)
+    combined = compile_combined_signal(COMBINED_CONFIG)(data)
+    np.testing.assert_allclose(combined.to_numpy(), expected.to_numpy(), rtol=1e-12)
+    assert combined.index.equals(data.index)
+
+def test_combined_signal_without_rules(kernels):
+    data = make_prices(3, 'random')
+    combined = compile_combined_signal({'entry': {'weight': 1.0, 'rules': []}})(data)
+    np.testing.assert_array_equal(combined.to_numpy(), np.zeros(3))
+
+@pytest.mark.parametrize('path', ['numba', 'bottleneck', 'pandas'])
+def test_rolling_std_over_flat_prices(path, monkeypatch):
+    if path == 'numba':
+        if not NUMBA_AVAILABLE:
+            pytest.skip("numba is not installed")
+    else:
+        monkeypatch.setattr(cached_frame, 'NUMBA_AVAILABLE', False)
+        if path == 'pandas':
+            monkeypatch.setattr(cached_frame, 'bn', None)
+        elif cached_frame.bn is None:
+            pytest.skip("bottleneck is not installed")
+    data = make_prices(160, 'random')
+    data.loc[data.index[60:100], 'Close'] = data['Close'].iloc[60]
+    
+    std = CachedFrame(data).rolling_std(20).to_numpy()
+    expected = data['Close'].pct_change(fill_method=None).rolling(20).std().to_numpy()
+    np.testing.assert_allclose(std, expected, rtol=1e-7, atol=1e-9)
+    # Windows of zero returns only; pandas 3 leaves ~1e-10 here
+    np.testing.assert_array_equal(std[80:100], 0.0)
@@ -34,7 +34,7 @@ def test_momentum_strategy():
     try:
         # 1. Fetch data
         print("Fetching data...")
-        data = data_agent.fetch_data(symbol, start_date, end_date)
+        data = data_agent.fetch_data(symbol, start=start_date, end=end_date)
         
         # 2. Generate strategy code
         print("Generating strategy code...")
@@ -0,0 +1,393 @@
+"""
+Numba kernels for the trading rules.
+
+Each kernel makes one pass over C-contiguous float64 price arrays and
+returns an int8 signal (or a float64 rolling statistic). Kernels are
+declared with explicit signatures, so they are compiled (or loaded from
+numba's on-disk cache) at import time instead of on the first rule call,
+and release the GIL while running. Callers should use these when
+``NUMBA_AVAILABLE`` is True and pass arrays through ``np.ascontiguousarray``.
+Plain numpy fallbacks shared by several callers end in ``_np``.
+"""
+
+import math
+import numpy as np
+from utils._njit import njit, NUMBA_AVAILABLE
+
+if NUMBA_AVAILABLE:
+    from numba.types import Array, float64, int8, int64
+    # Inputs are read-only C-contiguous float64: pandas hands out read-only
+    # views under copy-on-write, and writable arrays convert to this type
+    PRICES = Array(float64, 1, 'C', readonly=True)
+    SIGNAL = int8[::1]
+    SERIES = float64[::1]
+else:  # the no-op njit ignores signatures
+    PRICES = SIGNAL = SERIES = float64 = int64 = None
+
+# Same cancellation test as pandas' rolling variance: an update that leaves
+# under ~3 significant digits of m2 triggers a recompute of the window
+INV_COND_TOL = np.finfo(np.float64).eps * 1e3
+
+def _sig(return_type, *arg_types):
+    """Numba signature for an eagerly compiled kernel, or None without numba."""
+    return return_type(*arg_types) if NUMBA_AVAILABLE else None
+
+@njit(_sig(SIGNAL, PRICES, int64, float64), cache=True, nogil=True, error_model='numpy')
+def zscore_signal(close: np.ndarray, lookback: int, threshold: float) -> np.ndarray:
+    """Z-score momentum signal in one pass over close.
+    
+    Keeps a Welford mean/variance of the last ``lookback`` returns that are
+    defined, and compares the deviation with threshold * std so that a flat
+    window needs no division. A window of identical returns has a z-score of
+    0/0 in pandas and gives no signal here either. Returns leaving the window
+    are recomputed from close rather than stored.
+    """
+    n = len(close)
+    signal = np.zeros(n, dtype=np.int8)
+    count = 0
+    mean = 0.0
+    m2 = 0.0
+    same_run = 0
+    prev = np.nan
+    for i in range(lookback, n):
+        r = close[i] / close[i - lookback] - 1.0
+        same_run = same_run + 1 if r == prev else 1
+        prev = r
+        if not math.isnan(r):
+            count += 1
+            delta = r - mean
+            mean += delta / count
+            m2 += delta * (r - mean)
+        if i >= 2 * lookback:
+            old = close[i - lookback] / close[i - 2 * lookback] - 1.0
+            if not math.isnan(old):
+                count -= 1
+                if count == 0:
+                    mean = 0.0
+                    m2 = 0.0
+                else:
+                    delta = old - mean
+                    mean -= delta / count
+                    m2 -= delta * (old - mean)
+        if count == lookback and count > 1 and same_run < lookback:
+            band = threshold * math.sqrt(max(m2, 0.0) / (count - 1))
+            deviation = r - mean
+            signal[i] = -1 if deviation < -band else int(deviation > band)
+    return signal
+
+@njit(_sig(SIGNAL, PRICES, int64, float64), cache=True, nogil=True, error_model='numpy')
+def roc_signal(close: np.ndarray, lookback: int, threshold: float) -> np.ndarray:
+    """Rate-of-change signal in one pass over close."""
+    n = len(close)
+    signal = np.zeros(n, dtype=np.int8)
+    for i in range(lookback, n):
+        roc = (close[i] / close[i - lookback] - 1.0) * 100.0
+        signal[i] = -1 if roc < -threshold else int(roc > threshold)
+    return signal
+
+@njit(_sig(SERIES, PRICES, int64), cache=True, nogil=True)
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Rolling mean matching pandas ``rolling(window).mean()``.
+    
+    Uses the same Kahan-compensated window sums and the same exact result
+    for runs of identical values, so band comparisons agree with pandas.
+    """
+    n = len(values)
+    out = np.full(n, np.nan)
+    count = 0
+    neg_count = 0
+    total = 0.0
+    comp_add = 0.0
+    comp_remove = 0.0
+    same_run = 0
+    prev_value = values[0] if n > 0 else np.nan
+    for i in range(n):
+        if i >= window:
+            x = values[i - window]
+            if not math.isnan(x):
+                count -= 1
+                y = -x - comp_remove
+                t = total + y
+                comp_remove = t - total - y
+                total = t
+                if math.copysign(1.0, x) < 0:
+                    neg_count -= 1
+        x = values[i]
+        if not math.isnan(x):
+            count += 1
+            y = x - comp_add
+            t = total + y
+            comp_add = t - total - y
+            total = t
+            if math.copysign(1.0, x) < 0:
+                neg_count += 1
+            same_run = same_run + 1 if x == prev_value else 1
+            prev_value = x
+        if count >= window and count > 0:
+            mean = total / count
+            if same_run >= count:
+                mean = prev_value
+            elif neg_count == 0 and mean < 0:
+                mean = 0.0
+            elif neg_count == count and mean > 0:
+                mean = 0.0
+            out[i] = mean
+    return out
+
+def true_range_np(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """True range with numpy, for callers without numba.
+    
+    The gaps to the previous close are built in place; the first bar has
+    none, and fmax skips it.
+    """
+    high_close = np.empty_like(close)
+    high_close[:1] = np.nan
+    np.subtract(high[1:], close[:-1], out=high_close[1:])
+    np.abs(high_close, out=high_close)
+    low_close = np.empty_like(close)
+    low_close[:1] = np.nan
+    np.subtract(low[1:], close[:-1], out=low_close[1:])
+    np.abs(low_close, out=low_close)
+    
+    true_range = high - low
+    np.fmax(true_range, high_close, out=true_range)
+    np.fmax(true_range, low_close, out=true_range)
+    return true_range
+
+@njit(_sig(SERIES, PRICES, PRICES, PRICES), cache=True, nogil=True)
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """Largest of high-low and the gaps to the previous close, skipping NaNs."""
+    n = len(close)
+    out = np.empty(n)
+    for i in range(n):
+        tr = high[i] - low[i]
+        if i > 0:
+            up = abs(high[i] - close[i - 1])
+            down = abs(low[i] - close[i - 1])
+            if math.isnan(tr) or up > tr:
+                tr = up
+            if math.isnan(tr) or down > tr:
+                tr = down
+        out[i] = tr
+    return out
+
+@njit(_sig(SIGNAL, PRICES, PRICES, PRICES, PRICES, int64, float64), cache=True, nogil=True)
+def atr_breakout_signal(high: np.ndarray, low: np.ndarray, close: np.ndarray, middle: np.ndarray,
+                        lookback: int, multiplier: float) -> np.ndarray:
+    """ATR band breakout signal without intermediate pandas objects."""
+    n = len(close)
+    atr = rolling_mean(true_range(high, low, close), lookback)
+    signal = np.zeros(n, dtype=np.int8)
+    for i in range(n):
+        band = multiplier * atr[i]
+        signal[i] = -1 if close[i] < middle[i] - band else int(close[i] > middle[i] + band)
+    return signal
+
+@njit(_sig(SERIES, PRICES, int64), cache=True, nogil=True)
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """Rolling max with a monotonic index deque, O(N).
+    
+    Like pandas, a value needs ``window`` defined observations in its window.
+    The rolling min is ``-rolling_max(-values, window)``.
+    """
+    n = len(values)
+    out = np.full(n, np.nan)
+    deque = np.empty(n, dtype=np.int64)
+    head = tail = 0
+    count = 0
+    for i in range(n):
+        if i >= window and not math.isnan(values[i - window]):
+            count -= 1
+        if not math.isnan(values[i]):
+            count += 1
+            while tail > head and values[deque[tail - 1]] <= values[i]:
+                tail -= 1
+            deque[tail] = i
+            tail += 1
+        while tail > head and deque[head] <= i - window:
+            head += 1
+        if count >= window:
+            out[i] = values[deque[head]]
+    return out
+
+@njit(_sig(SIGNAL, PRICES, PRICES, PRICES, float64), cache=True, nogil=True)
+def channel_breakout_signal(rolling_high: np.ndarray, rolling_low: np.ndarray, close: np.ndarray,
+                            channel_width: float) -> np.ndarray:
+    """Channel breakout signal from the rolling high/low channel."""
+    signal = np.zeros(len(close), dtype=np.int8)
+    for i in range(len(close)):
+        channel_mid = (rolling_high[i] + rolling_low[i]) / 2
+        half_width = channel_width * (rolling_high[i] - rolling_low[i]) / 2
+        signal[i] = -1 if close[i] < channel_mid - half_width else int(close[i] > channel_mid + half_width)
+    return signal
+
+@njit(_sig(SIGNAL, PRICES, PRICES, PRICES, float64), cache=True, nogil=True, error_model='numpy')
+def support_resistance_signal(rolling_high: np.ndarray, rolling_low: np.ndarray, close: np.ndarray,
+                              threshold: float) -> np.ndarray:
+    """Support/resistance signal from the relative distance to the rolling high/low."""
+    signal = np.zeros(len(close), dtype=np.int8)
+    limit = threshold / 100
+    for i in range(len(close)):
+        dist_from_high = (rolling_high[i] - close[i]) / close[i]
+        dist_from_low = (close[i] - rolling_low[i]) / close[i]
+        signal[i] = -1 if dist_from_low < limit else int(dist_from_high < limit)
+    return signal
+
+@njit(_sig(SIGNAL, PRICES, float64, float64), cache=True, nogil=True)
+def ema_crossover_signal(close: np.ndarray, fast_alpha: float, slow_alpha: float) -> np.ndarray:
+    """EMA crossover signal with both EMAs updated in one recursive pass.
+    
+    Follows pandas ``ewm(adjust=False).mean()`` step for step (NaN closes
+    decay the old weight, equal values leave the average untouched) so the
+    crossover agrees with the pandas implementation.
+    """
+    n = len(close)
+    signal = np.zeros(n, dtype=np.int8)
+    if n == 0:
+        return signal
+    fast = close[0]
+    slow = close[0]
+    fast_wt = 1.0
+    slow_wt = 1.0
+    for i in range(1, n):
+        x = close[i]
+        observed = not math.isnan(x)
+        if not math.isnan(fast):
+            fast_wt *= 1.0 - fast_alpha
+            slow_wt *= 1.0 - slow_alpha
+            if observed:
+                if fast != x:
+                    fast = (fast_wt * fast + fast_alpha * x) / (fast_wt + fast_alpha)
+                if slow != x:
+                    slow = (slow_wt * slow + slow_alpha * x) / (slow_wt + slow_alpha)
+                fast_wt = 1.0
+                slow_wt = 1.0
+        elif observed:
+            fast = x
+            slow = x
+        signal[i] = -1 if fast < slow else int(fast > slow)
+    return signal
+
+@njit(_sig(SIGNAL, PRICES, PRICES), cache=True, nogil=True)
+def crossover_signal(fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    """Long where fast is above slow, short where it is below."""
+    signal = np.zeros(len(fast), dtype=np.int8)
+    for i in range(len(fast)):
+        signal[i] = -1 if fast[i] < slow[i] else int(fast[i] > slow[i])
+    return signal
+
+@njit(cache=True, nogil=True, error_model='numpy')
+def _pct_return(close: np.ndarray, i: int) -> float:
+    """One-bar return ending at bar i, NaN for the first bar."""
+    if i < 1:
+        return np.nan
+    return close[i] / close[i - 1] - 1.0
+
+@njit(cache=True, nogil=True)
+def _var_update(x: float, sign: float, count: float, mean: float, m2: float, comp: float):
+    """Add (sign=1) or remove (sign=-1) x from a Kahan-compensated Welford
+    variance, as pandas ``add_var``/``remove_var`` do.
+    
+    Returns the new (count, mean, m2, comp) and whether the update lost
+    most of m2 to cancellation.
+    """
+    prev_m2 = m2
+    count += sign
+    if count == 0:
+        return count, 0.0, 0.0, comp, False
+    prev_mean = mean - comp
+    y = x - comp
+    t = y - mean
+    comp = t + mean - y
+    mean += sign * t / count
+    m2 += sign * (x - prev_mean) * (x - mean)
+    return count, mean, m2, comp, prev_m2 * INV_COND_TOL > m2
+
+@njit(_sig(SIGNAL, PRICES, int64, float64), cache=True, nogil=True, error_model='numpy')
+def volatility_regime_signal(close: np.ndarray, lookback: int, threshold: float) -> np.ndarray:
+    """Volatility regime signal in one pass over close.
+    
+    Annualized rolling std of one-bar returns against its own rolling mean,
+    both over ``lookback`` bars. The std follows pandas ``roll_var`` (Kahan
+    compensated Welford updates, recomputing the window when cancellation
+    is detected) and the mean follows ``roll_mean``, so the regimes agree
+    with the pandas implementation. Returns leaving the window are
+    recomputed from close; the last ``lookback`` vols are kept in a ring
+    buffer. Like pandas rolling windows, infinite values count as missing.
+    """
+    n = len(close)
+    signal = np.zeros(n, dtype=np.int8)
+    if lookback < 2:
+        return signal  # a one-return window has no sample std
+    annualize = math.sqrt(252.0)
+    
+    # Rolling variance of returns
+    count = mean = m2 = comp_add = comp_remove = 0.0
+    unstable = False
+    
+    # Rolling mean of vol
+    vol_window = np.full(lookback, np.nan)
+    vol_count = 0
+    neg_count = 0
+    total = 0.0
+    vol_comp_add = 0.0
+    vol_comp_remove = 0.0
+    same_run = 0
+    prev_vol = np.nan
+    
+    for i in range(n):
+        if i >= lookback:
+            x = _pct_return(close, i - lookback)
+            if math.isfinite(x):
+                count, mean, m2, comp_remove, lost = _var_update(x, -1.0, count, mean, m2, comp_remove)
+                unstable = (unstable or lost) and count > 0
+        x = _pct_return(close, i)
+        if math.isfinite(x):
+            count, mean, m2, comp_add, lost = _var_update(x, 1.0, count, mean, m2, comp_add)
+            unstable = unstable or lost
+        if unstable:
+            count = mean = m2 = comp_add = comp_remove = 0.0
+            for j in range(max(i - lookback + 1, 0), i + 1):
+                x = _pct_return(close, j)
+                if math.isfinite(x):
+                    count, mean, m2, comp_add, lost = _var_update(x, 1.0, count, mean, m2, comp_add)
+            unstable = False
+        
+        vol = np.nan
+        if count >= lookback:
+            var = m2 / (count - 1)
+            vol = (0.0 if var < 0 else math.sqrt(var)) * annualize
+        
+        slot = i % lookback
+        if i >= lookback:
+            x = vol_window[slot]
+            if math.isfinite(x):
+                vol_count -= 1
+                y = -x - vol_comp_remove
+                t = total + y
+                vol_comp_remove = t - total - y
+                total = t
+                if math.copysign(1.0, x) < 0:
+                    neg_count -= 1
+        vol_window[slot] = vol
+        if math.isfinite(vol):
+            vol_count += 1
+            y = vol - vol_comp_add
+            t = total + y
+            vol_comp_add = t - total - y
+            total = t
+            if math.copysign(1.0, vol) < 0:
+                neg_count += 1
+            same_run = same_run + 1 if vol == prev_vol else 1
+            prev_vol = vol
+        
+        if vol_count >= lookback:
+            avg_vol = total / vol_count
+            if same_run >= vol_count:
+                avg_vol = prev_vol
+            elif neg_count == 0 and avg_vol < 0:
+                avg_vol = 0.0
+            elif neg_count == vol_count and avg_vol > 0:
+                avg_vol = 0.0
+            signal[i] = -1 if vol > avg_vol * threshold else int(vol < avg_vol / threshold)
+    return signal
@@ -0,0 +1,22 @@
+"""
+Optional Numba support.
+
+Kernels decorated with ``njit`` from this module are JIT-compiled when numba
+is installed and run as plain Python otherwise, so callers should check
+``NUMBA_AVAILABLE`` and prefer a vectorized NumPy path when it is False.
+"""
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for numba.njit supporting bare and called forms."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+        return decorator
@@ -0,0 +1,66 @@
+"""
+Numba kernels for position sizing.
+
+Sliding-window volatility and volatility-target sizing in a single pass
+over plain float64 arrays; rolling means and true range come from
+``utils._kernels``. Windows follow pandas ``rolling(window)``: a value is only
+produced once the window holds ``window`` finite observations. Callers
+should use these when ``NUMBA_AVAILABLE`` is True and keep their pandas or
+bottleneck path otherwise.
+"""
+
+import math
+import numpy as np
+from utils._njit import njit
+from utils._kernels import _var_update
+
+@njit(cache=True, error_model='numpy')
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Sample rolling std (ddof=1) following pandas ``roll_var``.
+    
+    Kahan-compensated Welford add/remove updates, recomputing the window
+    when an update loses most of m2 to cancellation. A window of identical
+    values has a std of exactly 0 and negative variances round to 0.
+    Infinite values count as missing.
+    """
+    n = len(values)
+    out = np.full(n, np.nan)
+    count = mean = m2 = comp_add = comp_remove = 0.0
+    unstable = False
+    same_run = 0
+    prev = np.nan
+    for i in range(n):
+        if i >= window:
+            x = values[i - window]
+            if math.isfinite(x):
+                count, mean, m2, comp_remove, lost = _var_update(x, -1.0, count, mean, m2, comp_remove)
+                unstable = (unstable or lost) and count > 0
+        x = values[i]
+        if math.isfinite(x):
+            count, mean, m2, comp_add, lost = _var_update(x, 1.0, count, mean, m2, comp_add)
+            unstable = unstable or lost
+            same_run = same_run + 1 if x == prev else 1
+            prev = x
+        if unstable:
+            count = mean = m2 = comp_add = comp_remove = 0.0
+            for j in range(max(i - window + 1, 0), i + 1):
+                x = values[j]
+                if math.isfinite(x):
+                    count, mean, m2, comp_add, lost = _var_update(x, 1.0, count, mean, m2, comp_add)
+            unstable = False
+        if count >= window and count > 1:
+            if same_run >= count:
+                out[i] = 0.0
+            else:
+                var = m2 / (count - 1)
+                out[i] = 0.0 if var < 0 else math.sqrt(var)
+    return out
+
+@njit(cache=True, error_model='numpy')
+def vol_target_sizing(returns: np.ndarray, lookback: int, target_vol: float, max_size: float) -> np.ndarray:
+    """Target volatility over annualized rolling volatility, capped at max_size."""
+    sizes = target_vol / (rolling_std(returns, lookback) * math.sqrt(252.0))
+    for i in range(len(sizes)):
+        if sizes[i] > max_size:
+            sizes[i] = max_size
+    return sizes
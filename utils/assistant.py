@@ -1,4 +1,8 @@
+from typing import List
+
 class Assistant:
+    __slots__ = ('name', 'description', 'instructions', 'tools', 'model')
+    
     def __init__(self, name: str, description: str, instructions: str, tools: list = None, model: str = "gpt-4-turbo-preview"):
         self.name = name
         self.description = description
@@ -8,4 +12,9 @@ class Assistant:
     
     def chat(self, message: str) -> str:
         # Implement basic chat functionality
-        return f"Response from {self.name}: {message}" 
\ No newline at end of file
+        return f"Response from {self.name}: {message}"
+    
+    def chat_batch(self, messages: List[str]) -> List[str]:
+        """Respond to several messages at once"""
+        prefix = f"Response from {self.name}: "
+        return [prefix + message for message in messages]
@@ -0,0 +1,128 @@
+"""
+Price data wrapper with memoized derived series.
+
+Rule implementations and position sizing both take a ``CachedFrame`` so
+that rolling windows, returns and true range are computed once per price
+frame and shared by every rule and sizing method evaluated on it.
+"""
+
+from functools import cached_property
+from typing import Union
+import pandas as pd
+import numpy as np
+from utils._njit import NUMBA_AVAILABLE
+from utils import _kernels, _sizing_njit
+
+try:
+    import bottleneck as bn
+except ImportError:  # bottleneck is optional; fall back to pandas rolling windows
+    bn = None
+
+def _rolling_stat(values: pd.Series, op: str, window: int) -> np.ndarray:
+    """Rolling mean/std/max/min of a column as a float64 array."""
+    if NUMBA_AVAILABLE and op != 'std':
+        values = np.ascontiguousarray(values.to_numpy(dtype=np.float64))
+        if op == 'mean':
+            return _kernels.rolling_mean(values, window)
+        if op == 'max':
+            return _kernels.rolling_max(values, window)
+        return -_kernels.rolling_max(-values, window)
+    # pandas' rolling kernels are O(N); a sliding_window_view reduction is
+    # O(N * window) and only faster for about a year of daily bars, and its
+    # mean/std round differently from pandas
+    return getattr(values.rolling(window), op)().to_numpy(dtype=np.float64)
+
+def _rolling_std(series: pd.Series, window: int) -> pd.Series:
+    """Sample rolling std (ddof=1) requiring a full window, like pandas.
+    
+    A window of identical values has a std of exactly 0 on every path, as
+    in pandas 2; pandas 3 can leave a rounding residue of ~1e-10 there.
+    """
+    values = series.to_numpy(dtype=np.float64)
+    if NUMBA_AVAILABLE:
+        return pd.Series(_sizing_njit.rolling_std(values, int(window)), index=series.index)
+    if bn is None:
+        rolling = series.rolling(window)
+        std = rolling.std().to_numpy(dtype=np.float64, copy=True)
+        flat = rolling.max().to_numpy() == rolling.min().to_numpy()
+    else:
+        std = bn.move_std(values, window, min_count=window, ddof=1)
+        flat = bn.move_max(values, window, min_count=window) == bn.move_min(values, window, min_count=window)
+    std[flat & (std > 0)] = 0.0
+    return pd.Series(std, index=series.index)
+
+def _rolling_mean(series: pd.Series, window: int) -> pd.Series:
+    """Rolling mean requiring a full window, like pandas."""
+    values = series.to_numpy(dtype=np.float64)
+    if NUMBA_AVAILABLE:
+        values = np.ascontiguousarray(values)
+        return pd.Series(_kernels.rolling_mean(values, int(window)), index=series.index)
+    if bn is None:
+        return series.rolling(window).mean()
+    return pd.Series(bn.move_mean(values, window, min_count=window), index=series.index)
+
+class CachedFrame:
+    """Wrap a price DataFrame and memoize series derived from it.
+    
+    Column access is delegated to the wrapped frame, so rules and sizing
+    code can use ``data['Close']`` and ``data.index`` as before while
+    sharing ``data.rolling(column, op, window)``, ``data.returns``,
+    ``data.rolling_std(lookback)`` and ``data.atr(periods)`` across calls.
+    """
+    
+    def __init__(self, data: pd.DataFrame):
+        self.data = data
+        self._stats = {}
+        self._rolling_std = {}
+        self._atr = {}
+    
+    def __getitem__(self, key):
+        return self.data[key]
+    
+    def __len__(self) -> int:
+        return len(self.data)
+    
+    @property
+    def index(self) -> pd.Index:
+        return self.data.index
+    
+    def rolling(self, column: str, op: str, window: int) -> np.ndarray:
+        """Rolling mean/std/max/min of a column as a float64 array"""
+        key = (column, op, int(window))
+        if key not in self._stats:
+            self._stats[key] = _rolling_stat(self.data[column], op, int(window))
+        return self._stats[key]
+    
+    @cached_property
+    def returns(self) -> pd.Series:
+        """Simple close-to-close returns"""
+        return self.data['Close'].pct_change(fill_method=None)
+    
+    def rolling_std(self, lookback: int) -> pd.Series:
+        """Rolling standard deviation of returns over ``lookback`` bars"""
+        if lookback not in self._rolling_std:
+            self._rolling_std[lookback] = _rolling_std(self.returns, lookback)
+        return self._rolling_std[lookback]
+    
+    @cached_property
+    def true_range(self) -> pd.Series:
+        """True range of each bar"""
+        high = np.ascontiguousarray(self.data['High'].to_numpy(dtype=np.float64))
+        low = np.ascontiguousarray(self.data['Low'].to_numpy(dtype=np.float64))
+        close = np.ascontiguousarray(self.data['Close'].to_numpy(dtype=np.float64))
+        if NUMBA_AVAILABLE:
+            return pd.Series(_kernels.true_range(high, low, close), index=self.index)
+        return pd.Series(_kernels.true_range_np(high, low, close), index=self.index)
+    
+    def atr(self, periods: int) -> pd.Series:
+        """Average true range over ``periods`` bars"""
+        if periods not in self._atr:
+            self._atr[periods] = _rolling_mean(self.true_range, periods)
+        return self._atr[periods]
+
+# Price data accepted by the rule implementations and position sizing
+PriceData = Union[pd.DataFrame, CachedFrame]
+
+def as_cached_frame(data: PriceData) -> CachedFrame:
+    """Return ``data`` wrapped in a CachedFrame unless it already is one."""
+    return data if isinstance(data, CachedFrame) else CachedFrame(data)
@@ -0,0 +1,32 @@
+"""
+Disk cache for Yahoo Finance price history.
+
+Downloads are memoized on disk with joblib when it is installed, keyed on
+(symbol, period, start, end) and refreshed after ``CACHE_EXPIRY_HOURS``, so
+repeated runs of the app or test scripts do not hit Yahoo again. Without
+joblib every call downloads.
+"""
+
+import yfinance as yf
+import pandas as pd
+
+try:
+    from joblib import Memory, expires_after
+except ImportError:  # joblib is optional; download on every call
+    Memory = None
+
+CACHE_DIR = '.yf_cache'
+CACHE_EXPIRY_HOURS = 12
+
+def _download_history(symbol: str, period: str = None, start: str = None, end: str = None) -> pd.DataFrame:
+    if start is not None or end is not None:
+        return yf.Ticker(symbol).history(start=start, end=end)
+    return yf.Ticker(symbol).history(period=period)
+
+if Memory is not None:
+    download_history = Memory(CACHE_DIR, verbose=0).cache(
+        _download_history,
+        cache_validation_callback=expires_after(hours=CACHE_EXPIRY_HOURS)
+    )
+else:
+    download_history = _download_history
@@ -1,52 +1,104 @@
 """
 Implementation of trading rules for each category.
+
+Each rule takes price data (a DataFrame, or a ``CachedFrame`` wrapping one
+so that rules evaluated together share rolling windows) and a parameter
+dict, and returns a -1/0/1 signal Series.
 """
 
 import pandas as pd
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, Callable
+from utils._njit import njit, NUMBA_AVAILABLE
+from utils import _kernels
+from utils.cached_frame import CachedFrame, PriceData, as_cached_frame
+
+def _to_signal(long_condition, short_condition) -> np.ndarray:
+    """Combine boolean conditions into a -1/0/1 int8 signal without branching.
+    
+    Short wins where both conditions hold.
+    """
+    long_condition = np.asarray(long_condition, dtype=bool)
+    short_condition = np.asarray(short_condition, dtype=bool)
+    return np.subtract(long_condition > short_condition, short_condition, dtype=np.int8)
+
+def _ewm_alpha(span: float) -> float:
+    """Smoothing factor for a span, computed the way pandas does."""
+    return 1.0 / (1.0 + (span - 1) / 2.0)
+
+def _column(data: PriceData, column: str) -> np.ndarray:
+    """A price column as the C-contiguous float64 array the kernels expect."""
+    return np.ascontiguousarray(data[column].to_numpy(dtype=np.float64))
+
+def _pct_change(close: np.ndarray, periods: int) -> np.ndarray:
+    """``pct_change(periods)`` on a float64 array, NaN for the first bars."""
+    returns = np.full(len(close), np.nan)
+    if periods < len(close):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns[periods:] = close[periods:] / close[:-periods] - 1
+    return returns
 
-def calculate_zscore_momentum(data: pd.DataFrame, params: Dict[str, Any]) -> pd.Series:
+def _rolling(data: PriceData, column: str, op: str, window: int) -> np.ndarray:
+    """Rolling statistic of a column, memoized when data is a CachedFrame."""
+    return as_cached_frame(data).rolling(column, op, window)
+
+def calculate_zscore_momentum(data: PriceData, params: Dict[str, Any]) -> pd.Series:
     """Calculate z-score momentum signal."""
     lookback = params['lookback']
     threshold = params['threshold']
     
+    if NUMBA_AVAILABLE:
+        close = _column(data, 'Close')
+        return pd.Series(_kernels.zscore_signal(close, int(lookback), float(threshold)), index=data.index)
+    
     # Calculate returns
-    returns = data['Close'].pct_change(lookback)
+    returns = _pct_change(_column(data, 'Close'), lookback)
     
     # Calculate z-score
-    zscore = (returns - returns.rolling(lookback).mean()) / returns.rolling(lookback).std()
+    window = pd.Series(returns).rolling(lookback)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zscore = (returns - window.mean().to_numpy()) / window.std().to_numpy()
     
     # Generate signal (-1 for short, 0 for neutral, 1 for long)
-    signal = pd.Series(0, index=data.index)
-    signal[zscore > threshold] = 1
-    signal[zscore < -threshold] = -1
-    
-    return signal
+    signal = _to_signal(
+        zscore > threshold,
+        zscore < -threshold
+    )
+    return pd.Series(signal, index=data.index)
 
-def calculate_roc(data: pd.DataFrame, params: Dict[str, Any]) -> pd.Series:
+def calculate_roc(data: PriceData, params: Dict[str, Any]) -> pd.Series:
     """Calculate rate of change signal."""
     lookback = params['lookback']
     threshold = params['threshold']
     
+    if NUMBA_AVAILABLE:
+        close = _column(data, 'Close')
+        return pd.Series(_kernels.roc_signal(close, int(lookback), float(threshold)), index=data.index)
+    
     # Calculate rate of change
-    roc = data['Close'].pct_change(lookback) * 100
+    roc = _pct_change(_column(data, 'Close'), lookback) * 100
     
     # Generate signal
-    signal = pd.Series(0, index=data.index)
-    signal[roc > threshold] = 1
-    signal[roc < -threshold] = -1
-    
-    return signal
+    signal = _to_signal(
+        roc > threshold,
+        roc < -threshold
+    )
+    return pd.Series(signal, index=data.index)
 
-def calculate_channel_breakout(data: pd.DataFrame, params: Dict[str, Any]) -> pd.Series:
+def calculate_channel_breakout(data: PriceData, params: Dict[str, Any]) -> pd.Series:
     """Calculate channel breakout signal."""
     lookback = params['lookback']
     channel_width = params['channel_width']
     
     # Calculate upper and lower channels
-    rolling_high = data['High'].rolling(lookback).max()
-    rolling_low = data['Low'].rolling(lookback).min()
+    rolling_high = _rolling(data, 'High', 'max', lookback)
+    rolling_low = _rolling(data, 'Low', 'min', lookback)
+    close = _column(data, 'Close')
+    
+    if NUMBA_AVAILABLE:
+        signal = _kernels.channel_breakout_signal(rolling_high, rolling_low, close, float(channel_width))
+        return pd.Series(signal, index=data.index)
+    
     channel_mid = (rolling_high + rolling_low) / 2
     channel_range = rolling_high - rolling_low
     
@@ -54,107 +106,139 @@ def calculate_channel_breakout(data: pd.DataFrame, params: Dict[str, Any]) -> pd
     lower_channel = channel_mid - (channel_width * channel_range / 2)
     
     # Generate signal
-    signal = pd.Series(0, index=data.index)
-    signal[data['Close'] > upper_channel] = 1
-    signal[data['Close'] < lower_channel] = -1
-    
-    return signal
+    signal = _to_signal(
+        close > upper_channel,
+        close < lower_channel
+    )
+    return pd.Series(signal, index=data.index)
 
-def calculate_support_resistance(data: pd.DataFrame, params: Dict[str, Any]) -> pd.Series:
+def calculate_support_resistance(data: PriceData, params: Dict[str, Any]) -> pd.Series:
     """Calculate support/resistance breakout signal."""
     lookback = params['lookback']
     threshold = params['threshold']
     
     # Calculate support and resistance levels
-    rolling_high = data['High'].rolling(lookback).max()
-    rolling_low = data['Low'].rolling(lookback).min()
+    rolling_high = _rolling(data, 'High', 'max', lookback)
+    rolling_low = _rolling(data, 'Low', 'min', lookback)
+    close = _column(data, 'Close')
     
-    # Calculate percentage distance from levels
-    dist_from_high = (rolling_high - data['Close']) / data['Close']
-    dist_from_low = (data['Close'] - rolling_low) / data['Close']
+    if NUMBA_AVAILABLE:
+        signal = _kernels.support_resistance_signal(rolling_high, rolling_low, close, float(threshold))
+        return pd.Series(signal, index=data.index)
     
-    # Generate signal
-    signal = pd.Series(0, index=data.index)
-    signal[dist_from_high < threshold/100] = 1  # Breaking resistance
-    signal[dist_from_low < threshold/100] = -1  # Breaking support
+    # Calculate percentage distance from levels, dividing in place
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dist_from_high = rolling_high - close
+        dist_from_high /= close
+        dist_from_low = close - rolling_low
+        dist_from_low /= close
     
-    return signal
+    # Generate signal
+    limit = threshold / 100
+    signal = _to_signal(
+        dist_from_high < limit,  # Breaking resistance
+        dist_from_low < limit  # Breaking support
+    )
+    return pd.Series(signal, index=data.index)
 
-def calculate_sma_crossover(data: pd.DataFrame, params: Dict[str, Any]) -> pd.Series:
+def calculate_sma_crossover(data: PriceData, params: Dict[str, Any]) -> pd.Series:
     """Calculate SMA crossover signal."""
     fast_period = params['fast_period']
     slow_period = params['slow_period']
     
-    # Calculate SMAs
-    fast_sma = data['Close'].rolling(fast_period).mean()
-    slow_sma = data['Close'].rolling(slow_period).mean()
+    # Calculate SMAs from compensated running window sums rather than a
+    # cumsum difference, which drifts and flips the sign of fast - slow
+    # where the two averages are equal (e.g. flat prices)
+    fast_sma = _rolling(data, 'Close', 'mean', fast_period)
+    slow_sma = _rolling(data, 'Close', 'mean', slow_period)
     
     # Generate signal
-    signal = pd.Series(0, index=data.index)
-    signal[fast_sma > slow_sma] = 1
-    signal[fast_sma < slow_sma] = -1
-    
-    return signal
+    signal = _to_signal(
+        fast_sma > slow_sma,
+        fast_sma < slow_sma
+    )
+    return pd.Series(signal, index=data.index)
 
-def calculate_ema_crossover(data: pd.DataFrame, params: Dict[str, Any]) -> pd.Series:
+def calculate_ema_crossover(data: PriceData, params: Dict[str, Any]) -> pd.Series:
     """Calculate EMA crossover signal."""
     fast_period = params['fast_period']
     slow_period = params['slow_period']
     
+    if NUMBA_AVAILABLE:
+        close = _column(data, 'Close')
+        signal = _kernels.ema_crossover_signal(close, _ewm_alpha(fast_period), _ewm_alpha(slow_period))
+        return pd.Series(signal, index=data.index)
+    
     # Calculate EMAs
-    fast_ema = data['Close'].ewm(span=fast_period, adjust=False).mean()
-    slow_ema = data['Close'].ewm(span=slow_period, adjust=False).mean()
+    fast_ema = data['Close'].ewm(span=fast_period, adjust=False).mean().to_numpy()
+    slow_ema = data['Close'].ewm(span=slow_period, adjust=False).mean().to_numpy()
     
     # Generate signal
-    signal = pd.Series(0, index=data.index)
-    signal[fast_ema > slow_ema] = 1
-    signal[fast_ema < slow_ema] = -1
-    
-    return signal
+    signal = _to_signal(
+        fast_ema > slow_ema,
+        fast_ema < slow_ema
+    )
+    return pd.Series(signal, index=data.index)
 
-def calculate_atr_breakout(data: pd.DataFrame, params: Dict[str, Any]) -> pd.Series:
+def calculate_atr_breakout(data: PriceData, params: Dict[str, Any]) -> pd.Series:
     """Calculate ATR breakout signal."""
     lookback = params['lookback']
     multiplier = params['multiplier']
     
+    middle = _rolling(data, 'Close', 'mean', lookback)
+    
+    if NUMBA_AVAILABLE:
+        signal = _kernels.atr_breakout_signal(
+            _column(data, 'High'),
+            _column(data, 'Low'),
+            _column(data, 'Close'),
+            middle,
+            int(lookback),
+            float(multiplier)
+        )
+        return pd.Series(signal, index=data.index)
+    
     # Calculate ATR
-    high_low = data['High'] - data['Low']
-    high_close = np.abs(data['High'] - data['Close'].shift())
-    low_close = np.abs(data['Low'] - data['Close'].shift())
-    ranges = pd.concat([high_low, high_close, low_close], axis=1)
-    true_range = ranges.max(axis=1)
-    atr = true_range.rolling(lookback).mean()
+    high = _column(data, 'High')
+    low = _column(data, 'Low')
+    close = _column(data, 'Close')
+    true_range = _kernels.true_range_np(high, low, close)
+    atr = pd.Series(true_range).rolling(lookback).mean().to_numpy()
     
     # Calculate bands
-    middle = data['Close'].rolling(lookback).mean()
-    upper = middle + (multiplier * atr)
-    lower = middle - (multiplier * atr)
+    band = multiplier * atr
+    upper = middle + band
+    lower = middle - band
     
     # Generate signal
-    signal = pd.Series(0, index=data.index)
-    signal[data['Close'] > upper] = 1
-    signal[data['Close'] < lower] = -1
-    
-    return signal
+    signal = _to_signal(
+        close > upper,
+        close < lower
+    )
+    return pd.Series(signal, index=data.index)
 
-def calculate_volatility_regime(data: pd.DataFrame, params: Dict[str, Any]) -> pd.Series:
+def calculate_volatility_regime(data: PriceData, params: Dict[str, Any]) -> pd.Series:
     """Calculate volatility regime signal."""
     lookback = params['lookback']
     threshold = params['threshold']
     
+    if NUMBA_AVAILABLE:
+        signal = _kernels.volatility_regime_signal(_column(data, 'Close'), int(lookback), float(threshold))
+        return pd.Series(signal, index=data.index)
+    
     # Calculate historical volatility
-    returns = data['Close'].pct_change()
-    vol = returns.rolling(lookback).std() * np.sqrt(252)  # Annualized
+    returns = _pct_change(_column(data, 'Close'), 1)
+    vol = pd.Series(returns).rolling(lookback).std().to_numpy() * np.sqrt(252)  # Annualized
     
     # Calculate average volatility
-    avg_vol = vol.rolling(lookback).mean()
+    avg_vol = pd.Series(vol).rolling(lookback).mean().to_numpy()
     
     # Generate signal
-    signal = pd.Series(0, index=data.index)
-    signal[vol < avg_vol / threshold] = 1  # Low volatility regime
-    signal[vol > avg_vol * threshold] = -1  # High volatility regime
-    
-    return signal
+    signal = _to_signal(
+        vol < avg_vol / threshold,  # Low volatility regime
+        vol > avg_vol * threshold  # High volatility regime
+    )
+    return pd.Series(signal, index=data.index)
 
 # Map rule types to their implementation functions
 RULE_IMPLEMENTATIONS = {
@@ -166,4 +250,170 @@ RULE_IMPLEMENTATIONS = {
     'ema_crossover': calculate_ema_crossover,
     'atr_breakout': calculate_atr_breakout,
     'volatility_regime': calculate_volatility_regime
-} 
\ No newline at end of file
+} 
+
+class CombinedSignal:
+    """Precompiled combined-strategy signal function.
+    
+    Rule implementations, parameters and weights are resolved once when the
+    strategy is generated, so calling the object only evaluates the rules.
+    Rule signals are written into an int8 (N, rules) matrix and reduced to
+    category and final signals with two matrix products. Produces the same
+    signal as the code from ``StrategyAgent._generate_signal_code``.
+    """
+    
+    def __init__(self, categories: Dict):
+        self.rules = []
+        rule_categories = []
+        rule_weights = []
+        for category_idx, config in enumerate(categories.values()):
+            for rule in config['rules']:
+                self.rules.append((
+                    RULE_IMPLEMENTATIONS[rule['type']],
+                    {k: v for k, v in rule['parameters'].items() if k != 'weight'}
+                ))
+                rule_categories.append(category_idx)
+                rule_weights.append(rule['parameters'].get('weight', 1.0))
+        
+        # rule_weights[k, c] is rule k's weight within category c
+        self.rule_weights = np.zeros((len(self.rules), len(categories)))
+        self.rule_weights[np.arange(len(self.rules)), rule_categories] = rule_weights
+        self.category_weights = np.array([config['weight'] for config in categories.values()], dtype=float)
+        self.total_weight = self.category_weights.sum()
+    
+    def __call__(self, data: pd.DataFrame) -> pd.Series:
+        if not self.rules:
+            return pd.Series(0.0, index=data.index)
+        
+        # Rules share rolling windows computed on the same columns
+        cache = CachedFrame(data)
+        rule_signals = np.empty((len(data), len(self.rules)), dtype=np.int8)
+        for k, (calculate, params) in enumerate(self.rules):
+            rule_signals[:, k] = calculate(cache, params).to_numpy()
+        
+        # Normalize category signals to -1, 0, 1 before weighting categories;
+        # the int8 rule signals are cast to float once, by the product
+        category_signals = np.sign(rule_signals @ self.rule_weights)
+        final_signal = category_signals @ self.category_weights
+        
+        if self.total_weight > 0:
+            final_signal /= self.total_weight
+        return pd.Series(final_signal, index=data.index)
+
+# Kernel expressions for each rule type, used by compile_combined_signal.
+# ``const`` names a compile-time constant and ``window`` a rolling window
+# shared between rules.
+
+def _fused_zscore(p, const, window):
+    return f"zscore_signal(close, {const(int(p['lookback']))}, {const(float(p['threshold']))})"
+
+def _fused_roc(p, const, window):
+    return f"roc_signal(close, {const(int(p['lookback']))}, {const(float(p['threshold']))})"
+
+def _fused_channel(p, const, window):
+    lookback = const(int(p['lookback']))
+    rolling_high = window(f"rolling_max(high, {lookback})")
+    rolling_low = window(f"-rolling_max(-low, {lookback})")
+    return f"channel_breakout_signal({rolling_high}, {rolling_low}, close, {const(float(p['channel_width']))})"
+
+def _fused_support_resistance(p, const, window):
+    lookback = const(int(p['lookback']))
+    rolling_high = window(f"rolling_max(high, {lookback})")
+    rolling_low = window(f"-rolling_max(-low, {lookback})")
+    return f"support_resistance_signal({rolling_high}, {rolling_low}, close, {const(float(p['threshold']))})"
+
+def _fused_sma_crossover(p, const, window):
+    fast_sma = window(f"rolling_mean(close, {const(int(p['fast_period']))})")
+    slow_sma = window(f"rolling_mean(close, {const(int(p['slow_period']))})")
+    return f"crossover_signal({fast_sma}, {slow_sma})"
+
+def _fused_ema_crossover(p, const, window):
+    fast_alpha = const(_ewm_alpha(p['fast_period']))
+    slow_alpha = const(_ewm_alpha(p['slow_period']))
+    return f"ema_crossover_signal(close, {fast_alpha}, {slow_alpha})"
+
+def _fused_atr_breakout(p, const, window):
+    lookback = const(int(p['lookback']))
+    middle = window(f"rolling_mean(close, {lookback})")
+    return f"atr_breakout_signal(high, low, close, {middle}, {lookback}, {const(float(p['multiplier']))})"
+
+def _fused_volatility_regime(p, const, window):
+    return f"volatility_regime_signal(close, {const(int(p['lookback']))}, {const(float(p['threshold']))})"
+
+FUSED_RULES = {
+    'zscore': _fused_zscore,
+    'roc': _fused_roc,
+    'channel': _fused_channel,
+    'support_resistance': _fused_support_resistance,
+    'sma_crossover': _fused_sma_crossover,
+    'ema_crossover': _fused_ema_crossover,
+    'atr_breakout': _fused_atr_breakout,
+    'volatility_regime': _fused_volatility_regime
+}
+
+def compile_combined_signal(categories: Dict) -> Callable[[pd.DataFrame], pd.Series]:
+    """Generate and JIT-compile one function for a combined strategy.
+    
+    ``categories`` is a rules config as returned by
+    ``StrategyRuleManager.get_rules_config``. The generated kernel computes
+    every rule signal from the price arrays, computing rolling windows
+    shared by several rules once, then accumulates the weighted category
+    and final signals in a single loop. Parameters and weights are baked
+    in as constants. Gives the same signal as ``CombinedSignal``. Meant for
+    numba (without it the generated code runs as plain Python); the
+    generated source is kept on the returned function as ``source``.
+    """
+    constants = {}
+    windows = {}
+    body = []
+    
+    def const(value):
+        key = (type(value), value)
+        if key not in constants:
+            constants[key] = f"c{len(constants)}"
+        return constants[key]
+    
+    def window(expr):
+        if expr not in windows:
+            windows[expr] = f"w{len(windows)}"
+            body.append(f"    {windows[expr]} = {expr}")
+        return windows[expr]
+    
+    category_terms = []
+    rule_count = 0
+    for config in categories.values():
+        rule_terms = []
+        for rule in config['rules']:
+            name = f"s{rule_count}"
+            rule_count += 1
+            params = {k: v for k, v in rule['parameters'].items() if k != 'weight'}
+            body.append(f"    {name} = {FUSED_RULES[rule['type']](params, const, window)}")
+            rule_terms.append(f"{name}[i] * {const(float(rule['parameters'].get('weight', 1.0)))}")
+        if rule_terms:
+            category_terms.append((' + '.join(rule_terms), const(float(config['weight']))))
+    total_weight = sum(config['weight'] for config in categories.values())
+    
+    lines = ["def combined_signal(high, low, close):"] + body
+    lines.append("    final = np.zeros(len(close))")
+    if category_terms:
+        lines.append("    for i in range(len(close)):")
+        for rule_sum, weight in category_terms:
+            lines.append(f"        category = {rule_sum}")
+            lines.append(f"        final[i] += (int(category > 0) - int(category < 0)) * {weight}")
+        if total_weight > 0:
+            lines.append(f"        final[i] /= {const(float(total_weight))}")
+    lines.append("    return final")
+    source = '\n'.join(lines) + '\n'
+    
+    namespace = {name: getattr(_kernels, name) for name in dir(_kernels) if not name.startswith('_')}
+    namespace['np'] = np
+    namespace.update({name: value for (_, value), name in constants.items()})
+    exec(compile(source, '<combined_signal>', 'exec'), namespace)
+    kernel = njit(nogil=True)(namespace['combined_signal'])
+    
+    def combined(data: pd.DataFrame) -> pd.Series:
+        final = kernel(_column(data, 'High'), _column(data, 'Low'), _column(data, 'Close'))
+        return pd.Series(final, index=data.index)
+    
+    combined.source = source
+    return combined
@@ -2,6 +2,14 @@
 Strategy rules configuration and management.
 """
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Tuple
+from utils._njit import NUMBA_AVAILABLE
+from utils.rule_implementations import RULE_IMPLEMENTATIONS, CombinedSignal, compile_combined_signal
+from utils.cached_frame import CachedFrame
+
 STRATEGY_CATEGORIES = {
     "entry": {
         "name": "Entry Rules",
@@ -211,41 +219,113 @@ STRATEGY_CATEGORIES = {
     }
 }
 
+@dataclass(slots=True, frozen=True)
 class StrategyRule:
-    def __init__(self, category, rule_type, parameters):
-        self.category = category
-        self.rule_type = rule_type
-        self.parameters = parameters
-        
+    """An active rule. Parameters are (name, value) pairs, so rules are hashable."""
+    category: str
+    rule_type: str
+    parameters: Tuple[Tuple[str, Any], ...]
+    
     def calculate_signal(self, data):
         """Calculate the signal for this rule based on the data."""
-        # Implementation will vary based on rule type
-        pass
+        params = {k: v for k, v in self.parameters if k != 'weight'}
+        return RULE_IMPLEMENTATIONS[self.rule_type](data, params)
 
 class StrategyRuleManager:
     def __init__(self):
         self.active_rules = {}  # Dictionary to store active rules by category
         self.category_weights = {}  # Dictionary to store category weights
+        self._rolling_cache = None  # Rolling statistics of the last data evaluated
+        self._version = 0  # Bumped on every rule or weight change
+        self._config = (-1, None)  # (version, config) of the last get_rules_config
+        self._combined_kernel = (None, None)  # (rules key, function) of the last compile
     
     def add_rule(self, category, rule_type, parameters):
         """Add a new rule to a category."""
         if category not in self.active_rules:
             self.active_rules[category] = []
         
-        rule = StrategyRule(category, rule_type, parameters)
+        rule = StrategyRule(category, rule_type, tuple(parameters.items()))
         self.active_rules[category].append(rule)
+        self._rolling_cache = None
+        self._version += 1
     
     def remove_rule(self, category, index):
         """Remove a rule from a category by index."""
         if category in self.active_rules and 0 <= index < len(self.active_rules[category]):
             self.active_rules[category].pop(index)
+            self._rolling_cache = None
+            self._version += 1
+    
+    def _cache_for(self, data):
+        """Rolling-statistics cache for data, reset when the data changes."""
+        if self._rolling_cache is None or self._rolling_cache.data is not data:
+            self._rolling_cache = CachedFrame(data)
+        return self._rolling_cache
+    
+    def get_rolling(self, data, column, op, lookback):
+        """Rolling mean/std/max/min of a data column, memoized per data frame."""
+        return self._cache_for(data).rolling(column, op, lookback)
+    
+    def evaluate_all(self, data, max_workers=None):
+        """Calculate the signal of every active rule, sharing rolling windows.
+        
+        With numba the rule kernels release the GIL, so rules are evaluated
+        on a thread pool (``max_workers`` defaults to the CPU count); without
+        it they run one after another. Returns a dict mapping each category to
+        its list of rule signals, in rule order.
+        """
+        cache = self._cache_for(data)
+        rules = [rule for category_rules in self.active_rules.values() for rule in category_rules]
+        if NUMBA_AVAILABLE and len(rules) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+                signals = list(pool.map(lambda rule: rule.calculate_signal(cache), rules))
+        else:
+            signals = [rule.calculate_signal(cache) for rule in rules]
+        
+        results = iter(signals)
+        return {
+            category: [next(results) for _ in category_rules]
+            for category, category_rules in self.active_rules.items()
+        }
+    
+    def compile_combined_kernel(self):
+        """Combined signal of the active rules as one function of the price data.
+        
+        With numba the rules and weights are code-generated into a single
+        fused kernel by ``compile_combined_signal``, recompiled only when the
+        set of rules or a weight changes. Without numba this falls back to
+        ``CombinedSignal``. Either way the function gives the signal of the
+        strategy built from ``get_rules_config()``.
+        """
+        key = tuple(
+            (category, self.category_weights.get(category, 1.0), tuple(rules))
+            for category, rules in self.active_rules.items()
+        )
+        if self._combined_kernel[0] != key:
+            if NUMBA_AVAILABLE:
+                combined = compile_combined_signal(self.get_rules_config())
+            else:
+                combined = CombinedSignal(self.get_rules_config())
+            self._combined_kernel = (key, combined)
+        return self._combined_kernel[1]
     
     def set_category_weight(self, category, weight):
         """Set the weight for a category."""
-        self.category_weights[category] = weight
+        if self.category_weights.get(category) != weight:
+            self.category_weights[category] = weight
+            self._version += 1
     
     def get_rules_config(self):
-        """Get the current configuration of all rules."""
+        """Get the current configuration of all rules.
+        
+        The config is rebuilt only after rules or weights change; callers
+        share the returned dict and should not modify it.
+        """
+        version, config = self._config
+        if version == self._version:
+            return config
+        
         config = {}
         for category in self.active_rules:
             config[category] = {
@@ -253,9 +333,10 @@ class StrategyRuleManager:
                 'rules': [
                     {
                         'type': rule.rule_type,
-                        'parameters': rule.parameters
+                        'parameters': dict(rule.parameters)
                     }
                     for rule in self.active_rules[category]
                 ]
             }
+        self._config = (self._version, config)
         return config 
\ No newline at end of file